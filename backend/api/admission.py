@@ -0,0 +1,170 @@
+"""
+Admission control and load shedding for API routes.
+
+Requests are sorted into route classes, each with its own concurrency limit
+and bounded wait queue. Health checks bypass admission entirely, and cheap
+reads and webcam frames each have their own pool, so a pile-up of forecast
+requests waiting on upstream APIs cannot starve them. When a class is
+saturated, requests wait in its queue until a deadline and are then shed
+with 503 and Retry-After, or answered from a stale snapshot when a fallback
+can provide one.
+"""
+import asyncio
+import logging
+import re
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import ADMISSION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# (route class, HTTP method or None for any, path pattern); first match wins
+ROUTE_CLASSES = [
+    ("health", None, r"^/api/health$"),
+    ("refresh", "POST", r"^/api/update-forecasts$"),
+    ("webcam", "GET", r"^/api/webcam/[^/]+$"),
+    ("upstream", "GET", r"^/api/(forecasts|region/[^/]+)$"),
+    ("read", None, r"^/api/"),
+]
+
+# Route classes that are never queued or shed
+BYPASS_CLASSES = ("health",)
+
+StaleFallback = Callable[[str], Optional[Response]]
+
+class ConcurrencyLimiter:
+    """Concurrency limit with a bounded FIFO wait queue and a wait deadline."""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: deque = deque()
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in the queue up to the deadline. False means shed."""
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except BaseException:
+            # Client went away while queued: hand back a slot we were just given
+            self._abandon(waiter)
+            raise
+
+        if waiter.done():
+            # release() transferred its slot to us
+            self.admitted += 1
+            return True
+
+        self._abandon(waiter)
+        self.timed_out += 1
+        return False
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        """Leave the queue, returning the slot if one was already handed over."""
+        if waiter.done() and not waiter.cancelled():
+            self.release()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        """Free a slot, handing it straight to the oldest live waiter if any."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get current load and counters."""
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+class AdmissionController:
+    """ASGI middleware applying per-route-class admission control."""
+
+    def __init__(self, app: ASGIApp, config: Dict[str, Dict[str, Any]] = ADMISSION_CONFIG,
+                 fallback: Optional[StaleFallback] = None):
+        self.app = app
+        self.fallback = fallback
+        self.routes: List[Tuple[str, Optional[str], re.Pattern]] = [
+            (name, method, re.compile(pattern)) for name, method, pattern in ROUTE_CLASSES
+        ]
+        self.limiters = {
+            name: ConcurrencyLimiter(
+                settings["max_concurrent"],
+                settings["max_queue"],
+                settings["queue_timeout_seconds"],
+            )
+            for name, settings in config.items()
+        }
+        self.retry_after = {name: settings["retry_after_seconds"] for name, settings in config.items()}
+
+    def classify(self, method: str, path: str) -> Optional[str]:
+        """Get the route class for a request, or None if it is not admission controlled."""
+        for name, route_method, pattern in self.routes:
+            if (route_method is None or route_method == method) and pattern.match(path):
+                return name
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = self.classify(scope["method"], scope["path"])
+        limiter = self.limiters.get(route_class)
+        if route_class in BYPASS_CLASSES or limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await limiter.acquire():
+            logger.warning(f"Shedding {scope['method']} {scope['path']} ({route_class} saturated)")
+            response = self.fallback(scope["path"]) if self.fallback else None
+            if response is None:
+                response = JSONResponse(
+                    {"detail": "Service is busy, please retry shortly"},
+                    status_code=503,
+                    headers={"Retry-After": str(self.retry_after[route_class])},
+                )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get load and counters for every route class."""
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
@@ -0,0 +1,105 @@
+"""
+Content negotiation and binary encodings for bulk forecast responses.
+
+Bulk consumers can ask for MessagePack or an Arrow IPC stream instead of
+JSON. Both are built from flat columns rather than nested per-resort
+dicts, so they stay small and decode without walking object trees.
+"""
+import logging
+from datetime import date
+from typing import List, Dict, Any
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional dependency
+    pa = None
+
+from backend.api.media_types import JSON, MSGPACK, ARROW, MEDIA_TYPES, negotiate  # noqa: F401
+from backend.services.weather_service import MODELS
+
+logger = logging.getLogger(__name__)
+
+# Daily variables exported per model, with the column each one becomes
+FORECAST_VARIABLES = {
+    "snowfall_sum": "snowfall_cm",
+    "temperature_2m_max": "temperature_max_c",
+    "temperature_2m_min": "temperature_min_c",
+    "precipitation_sum": "precipitation_mm",
+}
+
+KEY_COLUMNS = ("resort", "model", "region")
+
+class UnsupportedFormatError(Exception):
+    """Raised when a requested encoding needs a library that is not installed."""
+
+def forecast_columns(forecasts: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """Flatten per-resort forecasts into one row per resort, model and day."""
+    columns: Dict[str, List[Any]] = {"resort": [], "model": [], "date": []}
+    for column in FORECAST_VARIABLES.values():
+        columns[column] = []
+
+    for resort, forecast in forecasts.items():
+        for model in MODELS:
+            data = forecast.get(model)
+            if not data or "daily" not in data:
+                continue
+            daily = data["daily"]
+            dates = daily.get("time") or []
+            for position, day in enumerate(dates):
+                columns["resort"].append(resort)
+                columns["model"].append(model)
+                columns["date"].append(day)
+                for variable, column in FORECAST_VARIABLES.items():
+                    values = daily.get(variable) or []
+                    value = values[position] if position < len(values) else None
+                    # Same mm -> cm conversion as WeatherService.process_snowfall_data
+                    if variable == "snowfall_sum" and value is not None:
+                        value = value / 10
+                    columns[column].append(value)
+    return columns
+
+def top_snow_columns(results: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Turn top-snow rows into columns."""
+    return {
+        "region": [row["region"] for row in results],
+        "total_snowfall": [row["total_snowfall"] for row in results],
+    }
+
+def _to_arrow_stream(columns: Dict[str, List[Any]]) -> bytes:
+    """Encode columns as an Arrow IPC stream.
+
+    Key columns are dictionary-encoded strings, dates are date32 and every
+    numeric series is float32.
+    """
+    arrays = []
+    for name, values in columns.items():
+        if name in KEY_COLUMNS:
+            array = pa.array(values, pa.string()).dictionary_encode()
+        elif name == "date":
+            array = pa.array([date.fromisoformat(value) for value in values], pa.date32())
+        else:
+            array = pa.array(values, pa.float32())
+        arrays.append(array)
+    table = pa.Table.from_arrays(arrays, names=list(columns))
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def encode(columns: Dict[str, List[Any]], fmt: str) -> bytes:
+    """Encode columns in a binary format."""
+    if fmt == MSGPACK:
+        if msgpack is None:
+            raise UnsupportedFormatError("MessagePack output requires the msgpack package")
+        return msgpack.packb({"columns": columns}, use_single_float=True)
+    if fmt == ARROW:
+        if pa is None:
+            raise UnsupportedFormatError("Arrow output requires the pyarrow package")
+        return _to_arrow_stream(columns)
+    raise UnsupportedFormatError(f"Unknown format: {fmt}")
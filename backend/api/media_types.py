@@ -0,0 +1,54 @@
+"""
+Media types for the negotiated forecast encodings.
+
+Kept free of server imports so the Python client can share them.
+"""
+from typing import Optional
+
+JSON = "json"
+MSGPACK = "msgpack"
+ARROW = "arrow"
+
+MEDIA_TYPES = {
+    JSON: "application/json",
+    MSGPACK: "application/msgpack",
+    ARROW: "application/vnd.apache.arrow.stream",
+}
+
+_ACCEPTED = {
+    "application/json": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/vnd.apache.arrow.stream": ARROW,
+    # Wildcards get the default encoding
+    "application/*": JSON,
+    "*/*": JSON,
+}
+
+def negotiate(accept: Optional[str]) -> str:
+    """Pick the response format from an Accept header, defaulting to JSON.
+
+    The supported type with the highest ``q`` wins, earlier entries breaking
+    ties; ``q=0`` marks a type as unacceptable.
+    """
+    if not accept:
+        return JSON
+
+    best, best_quality = JSON, 0.0
+    for part in accept.split(","):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        fmt = _ACCEPTED.get(media_type.lower())
+        if fmt is None:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best, best_quality = fmt, quality
+    return best
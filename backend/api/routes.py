@@ -1,24 +1,59 @@
 """
 API routes for SkiStoke application.
 """
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import logging
-from datetime import datetime
+import re
+from datetime import datetime, timedelta, timezone
 
 from backend.services.weather_service import WeatherService
 from backend.models.database import DatabaseManager
-from config import SKI_RESORTS, WEATHER_CONFIG
+from backend.models.archive import ForecastArchive
+from backend.models.hourly_store import HourlyStore
+from backend.services.alert_service import AlertEngine
+from backend.services.webcam_service import WebcamService
+from backend.api import formats
+from config import SKI_RESORTS, WEATHER_CONFIG, HOURLY_CONFIG
 
 logger = logging.getLogger(__name__)
 
 # Initialize services
-weather_service = WeatherService()
+hourly_store = HourlyStore()
+weather_service = WeatherService(hourly_store)
 db_manager = DatabaseManager()
+forecast_archive = ForecastArchive(db_manager)
+alert_engine = AlertEngine(db_manager)
+webcam_service = WebcamService()
 
 # Create router
 router = APIRouter()
 
+class AlertRuleRequest(BaseModel):
+    """Powder alert rule definition."""
+    scope: str = Field("resort", description="resort, country or any")
+    target: Optional[str] = Field(None, description="Resort or country name for scoped rules")
+    window_days: int = Field(..., ge=1, le=WEATHER_CONFIG["forecast_days"], description="Days ahead to accumulate snowfall over")
+    threshold_cm: float = Field(..., gt=0, description="Snowfall that triggers the alert")
+    label: Optional[str] = None
+
+class ObservationRequest(BaseModel):
+    """Reported value that archived forecasts are verified against."""
+    region: str = Field(..., description="Resort name")
+    date: str = Field(..., description="Observed day (YYYY-MM-DD)")
+    variable: str = Field("snowfall_sum", description="Daily forecast variable")
+    value: float = Field(..., description="Observed value, in the variable's forecast units")
+
+@router.on_event("shutdown")
+def flush_database_writes():
+    """Commit queued writes before the process exits."""
+    db_manager.close()
+    hourly_store.close()
+
 @router.get("/")
 async def root():
     """Root endpoint."""
@@ -29,23 +64,55 @@ async def root():
             "/forecasts",
             "/top-snow",
             "/region/{region_name}",
+            "/region/{region_name}/hourly",
+            "/region/{region_name}/evolution",
+            "/skill",
+            "/observations",
+            "/alerts/rules",
+            "/quota",
+            "/webcams",
+            "/webcam/{webcam_id}",
             "/update-forecasts"
         ]
     }
 
+def _binary_response(columns: Dict[str, List[Any]], fmt: str, headers: Dict[str, str]) -> Response:
+    """Encode columns for a negotiated binary format, or 406 if it is unavailable."""
+    try:
+        content = formats.encode(columns, fmt)
+    except formats.UnsupportedFormatError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    return Response(content=content, media_type=formats.MEDIA_TYPES[fmt], headers=headers)
+
 @router.get("/forecasts")
-async def get_all_forecasts():
+async def get_all_forecasts(request: Request):
     """Get forecast data for all ski resorts."""
     try:
         logger.info("Fetching forecasts for all resorts")
-        forecasts = weather_service.fetch_all_resorts_forecast(SKI_RESORTS)
-        return {"forecasts": forecasts}
+        forecasts = await run_in_threadpool(weather_service.fetch_all_resorts_forecast, SKI_RESORTS)
+        
+        # The ETag only changes when some model's output changes
+        fmt = formats.negotiate(request.headers.get("accept"))
+        fingerprint = weather_service.combine_fingerprints(
+            {name: forecast.get("fingerprint") for name, forecast in forecasts.items()}
+        )
+        etag = f'"{fingerprint}"' if fmt == formats.JSON else f'"{fingerprint}-{fmt}"'
+        headers = {"ETag": etag, "Vary": "Accept"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        
+        if fmt == formats.JSON:
+            return JSONResponse({"forecasts": forecasts}, headers=headers)
+        return _binary_response(formats.forecast_columns(forecasts), fmt, headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching forecasts: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch forecasts")
 
 @router.get("/top-snow")
 async def get_top_snow(
+    request: Request,
     days: int = Query(3, ge=1, le=14, description="Number of days to look ahead"),
     limit: int = Query(10, ge=1, le=50, description="Maximum number of results")
 ):
@@ -53,7 +120,15 @@ async def get_top_snow(
     try:
         logger.info(f"Getting top snow for {days} days, limit {limit}")
         results = db_manager.get_top_snow(days, limit)
-        return {"top_snow": results}
+        
+        fmt = formats.negotiate(request.headers.get("accept"))
+        # Every encoding varies on Accept, JSON included, so shared caches keep them apart
+        headers = {"Vary": "Accept"}
+        if fmt == formats.JSON:
+            return JSONResponse({"top_snow": results}, headers=headers)
+        return _binary_response(formats.top_snow_columns(results), fmt, headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting top snow: {e}")
         raise HTTPException(status_code=500, detail="Failed to get top snow data")
@@ -71,11 +146,9 @@ async def get_region_forecast(
             raise HTTPException(status_code=404, detail="Region not found")
         
         logger.info(f"Fetching forecast for {region_name}")
-        forecast_data = weather_service.get_combined_forecast(
-            region["lat"], 
-            region["lon"], 
-            days
-        )
+        weather_service.scheduler.record_interest(region["name"])
+        # Upstream calls run off the event loop so cheap routes stay responsive
+        forecast_data = await run_in_threadpool(weather_service.get_resort_forecast, region, days)
         
         return {
             "region": region_name,
@@ -88,42 +161,306 @@ async def get_region_forecast(
         logger.error(f"Error fetching region forecast: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch region forecast")
 
+def stale_snapshot_response(path: str) -> Optional[Response]:
+    """Answer a shed region request from the latest snapshot, if there is one.
+    
+    Used by the admission controller instead of a 503 when the upstream-bound
+    route class is saturated.
+    """
+    match = re.match(r"^/api/region/([^/]+)$", path)
+    if match is None:
+        return None
+    
+    region = next((r for r in SKI_RESORTS if r["name"].lower() == match.group(1).lower()), None)
+    if not region:
+        return None
+    
+    forecast_data = weather_service.get_latest_forecast(region["name"])
+    if forecast_data is None:
+        return None
+    
+    return JSONResponse(
+        {
+            "region": match.group(1),
+            "coordinates": {"lat": region["lat"], "lon": region["lon"]},
+            "forecast": forecast_data,
+            "stale": True
+        },
+        headers={"Warning": '110 - "Response is Stale"'}
+    )
+
+@router.get("/region/{region_name}/hourly")
+async def get_hourly_forecast(
+    region_name: str,
+    model: str = Query("openMeteo", pattern="^(openMeteo|gfs)$", description="Forecast model"),
+    variables: Optional[str] = Query(None, description="Comma-separated hourly variables (default: all stored)"),
+    hours: int = Query(72, ge=1, le=HOURLY_CONFIG["max_window_hours"], description="Number of hours"),
+    start: Optional[str] = Query(None, description="First hour (ISO 8601, UTC if no offset); defaults to now")
+):
+    """Get hourly forecast series from the hourly store without calling upstream."""
+    region = next((r for r in SKI_RESORTS if r["name"].lower() == region_name.lower()), None)
+    if not region:
+        raise HTTPException(status_code=404, detail="Region not found")
+    
+    try:
+        start_time = datetime.fromisoformat(start) if start else datetime.now(timezone.utc)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Start must be an ISO 8601 timestamp")
+    start_index = hourly_store.hour_index(start_time)
+    if start_index < 0:
+        raise HTTPException(status_code=422, detail="Start is before the hourly store's time axis")
+    
+    if variables:
+        names = [name.strip() for name in variables.split(",") if name.strip()]
+        unknown = [name for name in names if name not in HOURLY_CONFIG["variables"]]
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Unknown hourly variables: {', '.join(unknown)}")
+    else:
+        names = hourly_store.variables(region["name"], model)
+    
+    series = {}
+    for name in names:
+        window = hourly_store.window(region["name"], model, name, start_index, hours)
+        # NaN marks hours never fetched; JSON has no NaN, so they become null
+        values = [None if value != value else round(value, 2) for value in window.tolist()]
+        values.extend([None] * (hours - len(values)))
+        series[name] = values
+    
+    return {
+        "region": region["name"],
+        "model": model,
+        "start": hourly_store.time_at(start_index).isoformat(),
+        "interval_seconds": 3600,
+        "hours": hours,
+        "series": series
+    }
+
+@router.get("/region/{region_name}/evolution")
+async def get_forecast_evolution(
+    region_name: str,
+    date: str = Query(..., description="Target date (YYYY-MM-DD)"),
+    variable: str = Query("snowfall_sum", description="Daily forecast variable"),
+    model: Optional[str] = Query(None, description="Restrict to one model (openMeteo or gfs)")
+):
+    """Get how the forecast for one date evolved across archived model runs."""
+    region = next((r for r in SKI_RESORTS if r["name"].lower() == region_name.lower()), None)
+    if not region:
+        raise HTTPException(status_code=404, detail="Region not found")
+    
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Date must be YYYY-MM-DD")
+    
+    evolution = forecast_archive.get_forecast_evolution(region["name"], date, variable, model)
+    return {"region": region["name"], "date": date, "variable": variable, "runs": evolution}
+
+@router.get("/skill")
+async def get_model_skill(
+    days: int = Query(30, ge=1, le=365, description="Number of past days to verify"),
+    variable: str = Query("snowfall_sum", description="Daily forecast variable"),
+    region: Optional[str] = Query(None, description="Restrict to one region")
+):
+    """Get per-model forecast error over a recent window."""
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days-1)
+    skill = await run_in_threadpool(
+        forecast_archive.get_model_skill, start_date.isoformat(), end_date.isoformat(), variable, region
+    )
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "variable": variable,
+        "skill": skill
+    }
+
+@router.post("/observations")
+async def record_observation(observation: ObservationRequest):
+    """Record a reported observation; it replaces the model analysis for that day."""
+    region = next((r for r in SKI_RESORTS if r["name"].lower() == observation.region.lower()), None)
+    if not region:
+        raise HTTPException(status_code=404, detail="Region not found")
+    
+    try:
+        datetime.strptime(observation.date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Date must be YYYY-MM-DD")
+    
+    stored = await run_in_threadpool(
+        forecast_archive.record_observation,
+        region["name"], observation.date, observation.variable, observation.value
+    )
+    if not stored:
+        raise HTTPException(status_code=500, detail="Failed to record observation")
+    return {"status": "success", "region": region["name"], "date": observation.date}
+
+def _queue_changed_forecasts() -> Tuple[List[Tuple[str, Dict[str, Any], List[Any], Optional[str]]], int]:
+    """Queue archive and forecast writes for every resort whose snapshot changed.
+    
+    Returns the pending (name, forecast, futures, stored snapshot fingerprint)
+    entries and the unchanged count. The fingerprint is None when the forecast
+    row was not written.
+    """
+    unchanged_count = 0
+    pending = []
+    for region in SKI_RESORTS:
+        try:
+            # Latest snapshot, whether fetched now or by an earlier read
+            forecast_data = weather_service.get_latest_forecast(region["name"])
+            if forecast_data is None:
+                continue
+            
+            # Archive runs follow each model's output; the forecast row averages
+            # both models, so it follows the whole (complete) snapshot instead
+            fingerprints = forecast_data["fingerprints"]
+            tracker = weather_service.change_tracker
+            changed_models = tracker.changed_models(region["name"], fingerprints)
+            snapshot_changed = tracker.snapshot_changed(region["name"], fingerprints,
+                                                        forecast_data["fingerprint"])
+            if not changed_models and not snapshot_changed:
+                unchanged_count += 1
+                continue
+            
+            # Keep every model run so forecasts can be verified later
+            writes = [
+                forecast_archive.queue_run(region["name"], model, forecast_data[model])
+                for model in changed_models
+            ]
+            
+            stored_fingerprint = None
+            if snapshot_changed:
+                # Calculate total snowfall for the period
+                total_snowfall = sum(forecast_data["average"])
+                
+                # Queue for the background writer; committed in batched transactions
+                date = datetime.now().date().isoformat()
+                writes.append(db_manager.queue_forecast(region["name"], date, total_snowfall))
+                # Day 0 of a complete snapshot doubles as the observation for skill
+                writes.append(forecast_archive.queue_analysis(
+                    region["name"], {model: forecast_data[model] for model in fingerprints}
+                ))
+                stored_fingerprint = forecast_data["fingerprint"]
+            pending.append((region["name"], forecast_data, writes, stored_fingerprint))
+            
+        except Exception as e:
+            logger.error(f"Error updating forecast for {region['name']}: {e}")
+            continue
+    
+    return pending, unchanged_count
+
 @router.post("/update-forecasts")
 async def update_forecasts():
     """Update forecast data in the database."""
     try:
         logger.info("Updating forecasts in database")
         updated_count = 0
+        changed_regions = []
+        changed_forecasts = {}
         
-        for region in SKI_RESORTS:
+        # Spend upstream calls only on resorts due under the refresh schedule
+        refreshed = await run_in_threadpool(weather_service.refresh_due_resorts, SKI_RESORTS)
+        
+        # Submitting can block on a full write queue, so it runs off the event loop
+        pending, unchanged_count = await run_in_threadpool(_queue_changed_forecasts)
+        
+        # Wait for the commits without holding up the event loop
+        for name, forecast_data, writes, stored_fingerprint in pending:
             try:
-                # Get forecast data
-                forecast_data = weather_service.get_combined_forecast(
-                    region["lat"], 
-                    region["lon"]
-                )
-                
-                # Calculate total snowfall for the period
-                total_snowfall = sum(forecast_data["average"])
-                
-                # Store in database
-                date = datetime.now().date().isoformat()
-                if db_manager.insert_forecast(region["name"], date, total_snowfall):
-                    updated_count += 1
-                
+                await asyncio.gather(*(asyncio.wrap_future(write) for write in writes if write is not None))
             except Exception as e:
-                logger.error(f"Error updating forecast for {region['name']}: {e}")
+                logger.error(f"Error updating forecast for {name}: {e}")
                 continue
+            weather_service.change_tracker.mark_stored(name, forecast_data["fingerprints"], stored_fingerprint)
+            changed_regions.append(name)
+            # Alerts read the averaged series, so only complete snapshots feed them
+            if stored_fingerprint is not None:
+                changed_forecasts[name] = forecast_data["average"]
+            updated_count += 1
+        
+        # One batch pass over every changed resort; sinks may block on I/O
+        alerts = await run_in_threadpool(alert_engine.evaluate, changed_forecasts, SKI_RESORTS)
         
         return {
             "status": "success",
-            "message": f"Updated forecasts for {updated_count} regions",
-            "updated_count": updated_count
+            "message": f"Updated forecasts for {updated_count} regions ({unchanged_count} unchanged)",
+            "updated_count": updated_count,
+            "refreshed_count": len(refreshed),
+            "unchanged_count": unchanged_count,
+            "changed_regions": changed_regions,
+            "alerts_fired": len(alerts)
         }
     except Exception as e:
         logger.error(f"Error updating forecasts: {e}")
         raise HTTPException(status_code=500, detail="Failed to update forecasts")
 
+@router.get("/alerts/rules")
+async def get_alert_rules():
+    """Get all powder alert rules."""
+    return {"rules": alert_engine.get_rules()}
+
+@router.post("/alerts/rules")
+async def create_alert_rule(rule: AlertRuleRequest):
+    """Create a powder alert rule."""
+    try:
+        rule_id = alert_engine.add_rule(rule.dict())
+        return {"status": "success", "rule_id": rule_id}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error creating alert rule: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create alert rule")
+
+@router.delete("/alerts/rules/{rule_id}")
+async def delete_alert_rule(rule_id: int):
+    """Delete a powder alert rule."""
+    if not alert_engine.remove_rule(rule_id):
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    return {"status": "success", "rule_id": rule_id}
+
+@router.get("/quota")
+async def get_quota():
+    """Get upstream call budget usage and the refresh schedule."""
+    return {
+        "usage": weather_service.quota.usage(),
+        "schedule": weather_service.scheduler.snapshot()
+    }
+
+@router.get("/webcams")
+async def get_webcams():
+    """Get list of proxied webcams."""
+    return {
+        "webcams": [
+            {"id": webcam_id, "name": webcam["name"], "url": f"/api/webcam/{webcam_id}"}
+            for webcam_id, webcam in webcam_service.webcams.items()
+        ]
+    }
+
+@router.get("/webcam/{webcam_id}")
+def get_webcam_frame(
+    webcam_id: str,
+    request: Request,
+    size: str = Query("full", pattern="^(full|thumb)$", description="full frame or thumbnail")
+):
+    """Get the latest webcam frame from the shared frame cache."""
+    if webcam_id not in webcam_service.webcams:
+        raise HTTPException(status_code=404, detail="Webcam not found")
+    
+    frame = webcam_service.get_frame(webcam_id)
+    if frame is None:
+        raise HTTPException(status_code=502, detail="Webcam unavailable")
+    
+    if size == "thumb":
+        content, media_type = webcam_service.get_thumbnail(webcam_id, frame)
+        etag = frame.etag[:-1] + '-thumb"'
+    else:
+        content, media_type = frame.content, frame.content_type
+        etag = frame.etag
+    
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={webcam_service.max_age(frame)}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type=media_type, headers=headers)
+
 @router.get("/resorts")
 async def get_resorts():
     """Get list of all ski resorts."""
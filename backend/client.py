@@ -0,0 +1,64 @@
+"""
+Python client for bulk consumers of the SkiStoke API.
+
+Requests forecasts as an Arrow IPC stream or MessagePack and decodes them
+into columns. Arrow decoding reads the response buffer in place; pyarrow
+and msgpack are only needed for the format actually used.
+"""
+import logging
+from typing import List, Dict, Any
+
+import requests
+
+from backend.api.media_types import ARROW, MSGPACK, MEDIA_TYPES
+
+logger = logging.getLogger(__name__)
+
+Columns = Dict[str, List[Any]]
+
+class SkiStokeClient:
+    """Client for the forecast and top-snow endpoints."""
+
+    def __init__(self, base_url: str = "http://localhost:8000/api", timeout: float = 30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _get(self, path: str, fmt: str, params: Dict[str, Any] = None) -> requests.Response:
+        """Request a path in a binary format."""
+        response = self.session.get(
+            f"{self.base_url}{path}",
+            params=params,
+            headers={"Accept": MEDIA_TYPES[fmt]},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def read_arrow(content: bytes):
+        """Decode an Arrow IPC stream into a ``pyarrow.Table`` without copying columns."""
+        import pyarrow as pa
+        return pa.ipc.open_stream(pa.py_buffer(content)).read_all()
+
+    @staticmethod
+    def read_msgpack(content: bytes) -> Columns:
+        """Decode a MessagePack response into columns."""
+        import msgpack
+        return msgpack.unpackb(content)["columns"]
+
+    def get_forecasts_table(self):
+        """Get all forecasts as a ``pyarrow.Table`` (one row per resort, model and day)."""
+        return self.read_arrow(self._get("/forecasts", ARROW).content)
+
+    def get_forecasts_columns(self) -> Columns:
+        """Get all forecasts as MessagePack-decoded columns."""
+        return self.read_msgpack(self._get("/forecasts", MSGPACK).content)
+
+    def get_top_snow_table(self, days: int = 3, limit: int = 10):
+        """Get top snow regions as a ``pyarrow.Table``."""
+        return self.read_arrow(self._get("/top-snow", ARROW, {"days": days, "limit": limit}).content)
+
+    def get_top_snow_columns(self, days: int = 3, limit: int = 10) -> Columns:
+        """Get top snow regions as MessagePack-decoded columns."""
+        return self.read_msgpack(self._get("/top-snow", MSGPACK, {"days": days, "limit": limit}).content)
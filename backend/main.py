@@ -2,14 +2,16 @@
 Main FastAPI application for SkiStoke.
 """
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, HTMLResponse
 import os
 
-from backend.api.routes import router
-from config import APP_CONFIG, CORS_CONFIG
+from backend.api.admission import AdmissionController
+from backend.api.routes import router, weather_service, stale_snapshot_response
+from backend.services.page_renderer import PageRenderer
+from config import APP_CONFIG, CORS_CONFIG, SKI_RESORTS
 
 # Configure logging
 logging.basicConfig(
@@ -26,6 +28,10 @@ app = FastAPI(
     debug=APP_CONFIG["debug"]
 )
 
+# Shed load per route class before it reaches upstream-bound handlers.
+# Added before CORS so shed responses still carry CORS headers.
+app.add_middleware(AdmissionController, fallback=stale_snapshot_response)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -42,16 +48,30 @@ app.include_router(router, prefix="/api")
 app.mount("/js", StaticFiles(directory="js"), name="js")
 app.mount("/css", StaticFiles(directory="."), name="css")
 
+# Pages rendered server-side from the latest forecast snapshot
+page_renderer = PageRenderer(weather_service, SKI_RESORTS)
+
+def render_page(page: str, request: Request) -> Response:
+    """Serve a rendered page, answering revalidation for an unchanged snapshot."""
+    content, version = page_renderer.render(page)
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(content, headers=headers)
+
 # Serve the main HTML files
 @app.get("/")
-async def serve_index():
+@app.get("/index.html")
+async def serve_index(request: Request):
     """Serve the main index page."""
-    return FileResponse("index.html")
+    return render_page("index.html", request)
 
 @app.get("/forecasts")
-async def serve_forecasts():
+@app.get("/forecasts.html")
+async def serve_forecasts(request: Request):
     """Serve the forecasts page."""
-    return FileResponse("forecasts.html")
+    return render_page("forecasts.html", request)
 
 @app.get("/about")
 async def serve_about():
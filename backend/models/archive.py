@@ -0,0 +1,447 @@
+"""
+Forecast vintage archive for SkiStoke application.
+
+Every model run is kept as a delta against the previous run of the same
+model for the same region: only cells (target date x variable) whose value
+changed are stored, and a run is reconstructed by carrying the latest
+stored cell forward.
+
+Verification errors are summed per region, target date, variable, model and
+lead time in ``forecast_skill``: a new run adds its errors against existing
+observations, and a new or changed observation rescores its cell. Skill
+queries then only add up a few small rows.
+"""
+import sqlite3
+import logging
+from typing import List, Dict, Optional, Any, Tuple
+from datetime import datetime, date, timezone
+from concurrent.futures import Future
+
+from backend.models.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Values closer than this are treated as unchanged between runs
+DELTA_TOLERANCE = 1e-6
+
+# Observation sources: reported values always win over the model analysis
+REPORTED = "reported"
+ANALYSIS = "analysis"
+
+_MISSING = object()
+
+class ForecastArchive:
+    """Stores every forecast model run and answers verification queries."""
+
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+        self._initialize_tables()
+
+    def _initialize_tables(self) -> None:
+        """Initialize archive tables."""
+        try:
+            with self.db_manager.get_connection() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS forecast_runs (
+                        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        region TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        issued_at TEXT NOT NULL,
+                        start_date TEXT NOT NULL,
+                        end_date TEXT NOT NULL
+                    )
+                """)
+                conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_forecast_runs_region_model
+                    ON forecast_runs(region, model, issued_at)
+                """)
+                # Runs covering a target date: only the recent ones still end on or after it
+                conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_forecast_runs_region_window
+                    ON forecast_runs(region, end_date, start_date)
+                """)
+
+                # Clustered on the evolution lookup: one range scan per target cell
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS forecast_run_cells (
+                        region TEXT NOT NULL,
+                        target_date TEXT NOT NULL,
+                        variable TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        run_id INTEGER NOT NULL,
+                        value REAL,
+                        PRIMARY KEY(region, target_date, variable, model, run_id)
+                    ) WITHOUT ROWID
+                """)
+                # Left by the earlier skill scan; forecast_skill answers those queries
+                conn.execute("DROP INDEX IF EXISTS idx_forecast_runs_window")
+                conn.execute("DROP INDEX IF EXISTS idx_forecast_run_cells_window")
+
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS forecast_observations (
+                        region TEXT NOT NULL,
+                        date TEXT NOT NULL,
+                        variable TEXT NOT NULL,
+                        value REAL NOT NULL,
+                        source TEXT NOT NULL DEFAULT 'reported',
+                        PRIMARY KEY(region, date, variable)
+                    ) WITHOUT ROWID
+                """)
+                columns = {row["name"] for row in conn.execute("PRAGMA table_info(forecast_observations)")}
+                if "source" not in columns:
+                    conn.execute("""
+                        ALTER TABLE forecast_observations
+                        ADD COLUMN source TEXT NOT NULL DEFAULT 'reported'
+                    """)
+
+                skill_exists = conn.execute("""
+                    SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'forecast_skill'
+                """).fetchone() is not None
+                # Summed errors of every verified run, one row per lead time
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS forecast_skill (
+                        region TEXT NOT NULL,
+                        target_date TEXT NOT NULL,
+                        variable TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        lead_days INTEGER NOT NULL,
+                        count INTEGER NOT NULL,
+                        abs_error REAL NOT NULL,
+                        error REAL NOT NULL,
+                        PRIMARY KEY(region, target_date, variable, model, lead_days)
+                    ) WITHOUT ROWID
+                """)
+                # Covers the skill window aggregate across all regions
+                conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_forecast_skill_window
+                    ON forecast_skill(variable, target_date, model, lead_days, count, abs_error, error, region)
+                """)
+                if not skill_exists:
+                    # Databases archived before the skill table existed
+                    observed = conn.execute("""
+                        SELECT region, date, variable FROM forecast_observations
+                    """).fetchall()
+                    for row in observed:
+                        self._refresh_skill(conn, row["region"], row["date"], row["variable"])
+
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Error initializing forecast archive: {e}")
+            raise
+
+    @staticmethod
+    def _changed(previous: Any, value: Optional[float]) -> bool:
+        """Check whether a cell differs from its previous value."""
+        if previous is _MISSING:
+            return True
+        if previous is None or value is None:
+            return previous is not value
+        return abs(previous - value) > DELTA_TOLERANCE
+
+    def _write_run(self, conn: sqlite3.Connection, region: str, model: str,
+                   daily: Dict[str, Any], issued_at: str) -> int:
+        """Write one run and its changed cells on an open connection without committing."""
+        dates = daily["time"]
+        variables = [name for name in daily if name != "time"]
+        start_date, end_date = min(dates), max(dates)
+
+        previous = self._latest_cells(conn, region, model, start_date, end_date)
+
+        cursor = conn.execute("""
+            INSERT INTO forecast_runs (region, model, issued_at, start_date, end_date)
+            VALUES (?, ?, ?, ?, ?)
+        """, (region, model, issued_at, start_date, end_date))
+        run_id = cursor.lastrowid
+
+        cells = []
+        current = dict(previous)
+        for variable in variables:
+            values = daily.get(variable) or []
+            for target_date, value in zip(dates, values):
+                if self._changed(previous.get((target_date, variable), _MISSING), value):
+                    cells.append((region, target_date, variable, model, run_id, value))
+                    current[(target_date, variable)] = value
+
+        conn.executemany("""
+            INSERT INTO forecast_run_cells (region, target_date, variable, model, run_id, value)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, cells)
+
+        # Add this run's errors for dates that already have observations;
+        # the other runs' errors for those cells are unchanged
+        observed = conn.execute("""
+            SELECT date, variable, value FROM forecast_observations
+            WHERE region = ? AND date BETWEEN ? AND ?
+        """, (region, start_date, end_date)).fetchall()
+        errors = []
+        for row in observed:
+            forecast = current.get((row["date"], row["variable"]))
+            if forecast is None:
+                continue
+            error = forecast - row["value"]
+            errors.append((region, row["date"], row["variable"], model,
+                           self._lead_days(issued_at, row["date"]), abs(error), error))
+        conn.executemany("""
+            INSERT INTO forecast_skill (region, target_date, variable, model, lead_days, count, abs_error, error)
+            VALUES (?, ?, ?, ?, ?, 1, ?, ?)
+            ON CONFLICT(region, target_date, variable, model, lead_days) DO UPDATE SET
+                count = count + 1,
+                abs_error = abs_error + excluded.abs_error,
+                error = error + excluded.error
+        """, errors)
+
+        logger.info(f"Archived {model} run for {region}: {len(cells)} changed cells")
+        return run_id
+
+    @staticmethod
+    def _daily_block(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Get the ``daily`` block of a response if it holds any dates."""
+        if not data or "daily" not in data or not data["daily"].get("time"):
+            return None
+        return data["daily"]
+
+    def record_run(self, region: str, model: str, data: Optional[Dict[str, Any]],
+                   issued_at: Optional[str] = None) -> Optional[int]:
+        """Archive one model run from an Open-Meteo style ``daily`` response."""
+        daily = self._daily_block(data)
+        if daily is None:
+            return None
+        issued_at = issued_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                run_id = self._write_run(conn, region, model, daily, issued_at)
+                conn.commit()
+                return run_id
+        except Exception as e:
+            logger.error(f"Error archiving forecast run: {e}")
+            return None
+
+    def queue_run(self, region: str, model: str, data: Optional[Dict[str, Any]],
+                  issued_at: Optional[str] = None) -> Optional[Future]:
+        """Queue a model run for the background writer; the future resolves to its run id."""
+        daily = self._daily_block(data)
+        if daily is None:
+            return None
+        issued_at = issued_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+        return self.db_manager.submit_write(
+            lambda conn: self._write_run(conn, region, model, daily, issued_at)
+        )
+
+    def _latest_cells(self, conn: sqlite3.Connection, region: str, model: str,
+                      start_date: str, end_date: str) -> Dict[Tuple[str, str], Optional[float]]:
+        """Reconstruct the latest archived value for every cell in a date range."""
+        cursor = conn.execute("""
+            SELECT target_date, variable, value
+            FROM forecast_run_cells
+            WHERE region = ? AND target_date BETWEEN ? AND ? AND model = ?
+            ORDER BY run_id
+        """, (region, start_date, end_date, model))
+        return {(row["target_date"], row["variable"]): row["value"] for row in cursor}
+
+    def _write_observation(self, conn: sqlite3.Connection, region: str, date: str,
+                           variable: str, value: float, source: str) -> bool:
+        """Write an observation and rescore its cell on an open connection without committing.
+
+        An analysis value never replaces a reported one. Returns whether the
+        observation was stored.
+        """
+        cursor = conn.execute("""
+            INSERT INTO forecast_observations (region, date, variable, value, source)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(region, date, variable) DO UPDATE SET
+                value = excluded.value,
+                source = excluded.source
+            WHERE excluded.source = ? OR forecast_observations.source = ?
+        """, (region, date, variable, value, source, REPORTED, ANALYSIS))
+        if cursor.rowcount == 0:
+            return False
+        self._refresh_skill(conn, region, date, variable)
+        return True
+
+    def record_observation(self, region: str, date: str, variable: str, value: float) -> bool:
+        """Record the reported verifying observation for a region and day."""
+        try:
+            with self.db_manager.get_connection() as conn:
+                self._write_observation(conn, region, date, variable, value, REPORTED)
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error recording observation: {e}")
+            return False
+
+    def _write_analysis(self, conn: sqlite3.Connection, region: str,
+                        responses: Dict[str, Optional[Dict[str, Any]]]) -> int:
+        """Store the models' mean day-0 values as the analysis for that day."""
+        dailies = [self._daily_block(data) for data in responses.values()]
+        if not dailies or any(daily is None for daily in dailies):
+            return 0
+        day = dailies[0]["time"][0]
+        if any(daily["time"][0] != day for daily in dailies):
+            return 0
+
+        variables = set.intersection(*(set(daily) for daily in dailies)) - {"time"}
+        stored = 0
+        for variable in sorted(variables):
+            values = [(daily[variable] or [None])[0] for daily in dailies]
+            if any(value is None for value in values):
+                continue
+            mean = sum(values) / len(values)
+            stored += self._write_observation(conn, region, day, variable, mean, ANALYSIS)
+        return stored
+
+    def queue_analysis(self, region: str, responses: Dict[str, Optional[Dict[str, Any]]]) -> Future:
+        """Queue the day-0 analysis of one refresh as provisional observations.
+
+        ``responses`` maps each model to its ``daily`` response. The mean of
+        every model's value for the first forecast day stands in for an
+        observation until a reported one is recorded, and is updated by each
+        later refresh of the same day, so short-lead runs verify against the
+        latest analysis. Nothing is stored unless every model responded.
+        """
+        return self.db_manager.submit_write(
+            lambda conn: self._write_analysis(conn, region, responses)
+        )
+
+    @staticmethod
+    def _lead_days(issued_at: str, target_date: str) -> int:
+        """Days between a run's issue date and the date it forecasts."""
+        return (date.fromisoformat(target_date) - date.fromisoformat(issued_at[:10])).days
+
+    def _evolution(self, conn: sqlite3.Connection, region: str, target_date: str,
+                   variable: str, model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Reconstruct every run's value for one target cell, oldest run first."""
+        model_filter = "AND model = ?" if model else ""
+        model_params = (model,) if model else ()
+
+        runs = conn.execute(f"""
+            SELECT run_id, model, issued_at
+            FROM forecast_runs
+            WHERE region = ? AND start_date <= ? AND end_date >= ? {model_filter}
+            ORDER BY run_id
+        """, (region, target_date, target_date, *model_params)).fetchall()
+
+        cells = conn.execute(f"""
+            SELECT model, run_id, value
+            FROM forecast_run_cells
+            WHERE region = ? AND target_date = ? AND variable = ? {model_filter}
+            ORDER BY run_id
+        """, (region, target_date, variable, *model_params)).fetchall()
+
+        # Carry each stored delta forward until the next change of that model
+        cells_by_model: Dict[str, List[sqlite3.Row]] = {}
+        for cell in cells:
+            cells_by_model.setdefault(cell["model"], []).append(cell)
+
+        positions = {name: 0 for name in cells_by_model}
+        current: Dict[str, Optional[float]] = {}
+        evolution = []
+        for run in runs:
+            name = run["model"]
+            model_cells = cells_by_model.get(name, [])
+            while positions.get(name, 0) < len(model_cells) and \
+                    model_cells[positions[name]]["run_id"] <= run["run_id"]:
+                current[name] = model_cells[positions[name]]["value"]
+                positions[name] += 1
+
+            if name not in current:
+                continue
+            evolution.append({
+                "model": name,
+                "issued_at": run["issued_at"],
+                "lead_days": self._lead_days(run["issued_at"], target_date),
+                "value": current[name],
+            })
+        return evolution
+
+    def _refresh_skill(self, conn: sqlite3.Connection, region: str, target_date: str,
+                       variable: str) -> None:
+        """Recompute the stored errors of every run against one observed cell."""
+        conn.execute("""
+            DELETE FROM forecast_skill WHERE region = ? AND target_date = ? AND variable = ?
+        """, (region, target_date, variable))
+        row = conn.execute("""
+            SELECT value FROM forecast_observations
+            WHERE region = ? AND date = ? AND variable = ?
+        """, (region, target_date, variable)).fetchone()
+        if row is None:
+            return
+
+        buckets: Dict[Tuple[str, int], List[float]] = {}
+        for run in self._evolution(conn, region, target_date, variable):
+            if run["value"] is None:
+                continue
+            error = run["value"] - row[0]
+            bucket = buckets.setdefault((run["model"], run["lead_days"]), [0, 0.0, 0.0])
+            bucket[0] += 1
+            bucket[1] += abs(error)
+            bucket[2] += error
+
+        conn.executemany("""
+            INSERT INTO forecast_skill (region, target_date, variable, model, lead_days, count, abs_error, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (region, target_date, variable, model, lead_days, *bucket)
+            for (model, lead_days), bucket in buckets.items()
+        ])
+
+    def get_forecast_evolution(self, region: str, target_date: str,
+                               variable: str = "snowfall_sum",
+                               model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get how the forecast for one target date changed across model runs."""
+        try:
+            with self.db_manager.get_connection() as conn:
+                return self._evolution(conn, region, target_date, variable, model)
+        except Exception as e:
+            logger.error(f"Error getting forecast evolution: {e}")
+            return []
+
+    def get_model_skill(self, start_date: str, end_date: str,
+                        variable: str = "snowfall_sum",
+                        region: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get per-model error statistics against observations over a date window.
+
+        Each model's ``mae``, ``bias`` and ``count`` pool every verified run,
+        whatever its lead time; ``by_lead_days`` breaks the same errors down by
+        days between issue and target date, since short-range runs are
+        naturally more accurate.
+        """
+        try:
+            region_filter = "AND region = ?" if region else ""
+            region_params = (region,) if region else ()
+
+            with self.db_manager.get_connection() as conn:
+                rows = conn.execute(f"""
+                    SELECT model, lead_days, SUM(count) AS count,
+                           SUM(abs_error) AS abs_error, SUM(error) AS error
+                    FROM forecast_skill
+                    WHERE variable = ? AND target_date BETWEEN ? AND ? {region_filter}
+                    GROUP BY model, lead_days
+                    ORDER BY model, lead_days
+                """, (variable, start_date, end_date, *region_params)).fetchall()
+
+            def summary(count: int, abs_error: float, error: float) -> Dict[str, Any]:
+                return {"count": count, "mae": abs_error / count, "bias": error / count}
+
+            totals: Dict[str, List[float]] = {}
+            by_lead_days: Dict[str, List[Dict[str, Any]]] = {}
+            for row in rows:
+                total = totals.setdefault(row["model"], [0, 0.0, 0.0])
+                total[0] += row["count"]
+                total[1] += row["abs_error"]
+                total[2] += row["error"]
+                by_lead_days.setdefault(row["model"], []).append({
+                    "lead_days": row["lead_days"],
+                    **summary(row["count"], row["abs_error"], row["error"]),
+                })
+
+            return sorted(
+                (
+                    {"model": name, **summary(*total), "by_lead_days": by_lead_days[name]}
+                    for name, total in totals.items()
+                ),
+                key=lambda row: row["mae"]
+            )
+        except Exception as e:
+            logger.error(f"Error getting model skill: {e}")
+            return []
@@ -3,25 +3,193 @@ Database models and operations for SkiStoke application.
 """
 import sqlite3
 import logging
+import threading
 from typing import List, Dict, Optional, Any
-from datetime import datetime, timedelta
+from datetime import date as Date, datetime, timedelta
 from contextlib import contextmanager
+from concurrent.futures import Future
+
+from backend.models.write_queue import WriteBehindQueue, WriteOperation
 
 logger = logging.getLogger(__name__)
 
+# Forecast rows are partitioned into one table per calendar month so that
+# retention can drop whole months instead of deleting row by row.
+PARTITION_PREFIX = "snow_forecast_"
+# Matches partition names exactly; LIKE would treat "_" as a wildcard
+PARTITION_GLOB = PARTITION_PREFIX + "[0-9][0-9][0-9][0-9]_[0-9][0-9]"
+LEGACY_TABLE = "snow_forecast"
+
+# PRAGMA user_version written once every migration has run
+SCHEMA_VERSION = 2
+
+# Partitions are clustered on (resort_id, day) for per-resort range scans;
+# the day-leading index covers the top-snow aggregate without touching the table.
+PARTITION_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        resort_id INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        snowfall REAL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY(resort_id, day)
+    ) WITHOUT ROWID
+"""
+PARTITION_INDEX_DDL = """
+    CREATE INDEX IF NOT EXISTS idx_{table}_day_resort
+    ON {table}(day, resort_id, snowfall)
+"""
+
+# SQL expression turning an ISO date column into days since 1970-01-01
+EPOCH_DAY_SQL = "CAST(julianday({column}) - 2440587.5 AS INTEGER)"
+
+_EPOCH_ORDINAL = Date(1970, 1, 1).toordinal()
+
+def to_epoch_day(date: str) -> int:
+    """Convert an ISO date to days since 1970-01-01."""
+    return Date.fromisoformat(date[:10]).toordinal() - _EPOCH_ORDINAL
+
+def from_epoch_day(day: int) -> str:
+    """Convert days since 1970-01-01 to an ISO date."""
+    return Date.fromordinal(day + _EPOCH_ORDINAL).isoformat()
+
 class DatabaseManager:
     """Manages database connections and operations."""
     
     def __init__(self, database_path: str = "snowcast.db"):
         self.database_path = database_path
+        # Write-path caches that let inserts skip DDL and name lookups. Readers
+        # list partitions from the schema instead, since other processes
+        # (another worker, a cleanup job) can create or drop them.
+        self._partitions = set()
+        self._resort_ids: Dict[str, int] = {}
+        # Guards the two caches above; they only ever hold committed schema
+        self._schema_lock = threading.Lock()
+        # Partitions and resort ids created by this thread's open transaction
+        self._uncommitted = threading.local()
         self._initialize_database()
+        # All background writes funnel through one writer thread
+        self.writer = WriteBehindQueue(
+            self.database_path,
+            on_rollback=self._reload_schema_cache,
+            on_commit=self._publish_schema
+        )
     
     def _initialize_database(self) -> None:
-        """Initialize database tables."""
+        """Initialize database tables and bring the schema up to date."""
         try:
             with self.get_connection() as conn:
+                # WAL lets readers keep serving while a writer (or a partition
+                # drop) holds the write lock
+                conn.execute("PRAGMA journal_mode=WAL")
+                
                 conn.execute("""
-                    CREATE TABLE IF NOT EXISTS snow_forecast (
+                    CREATE TABLE IF NOT EXISTS resorts (
+                        id INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL UNIQUE
+                    )
+                """)
+                
+                self._migrate(conn)
+                self._load_partitions(conn)
+                
+                conn.commit()
+                logger.info("Database initialized successfully")
+        except Exception as e:
+            logger.error(f"Error initializing database: {e}")
+            raise
+    
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        """Run every migration newer than the database's user_version, in order."""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            logger.warning(f"Database schema v{version} is newer than this code (v{SCHEMA_VERSION})")
+            return
+        
+        migrations = [
+            (1, self._migrate_legacy_table),
+            (2, self._migrate_compact_keys),
+        ]
+        for target, migration in migrations:
+            if version >= target:
+                continue
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+            version = target
+            logger.info(f"Migrated database schema to v{target}")
+    
+    @staticmethod
+    def _read_partitions(conn: sqlite3.Connection) -> List[str]:
+        """List the partition tables currently in the schema, oldest first."""
+        cursor = conn.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name GLOB ?
+            ORDER BY name
+        """, (PARTITION_GLOB,))
+        return [row[0] for row in cursor.fetchall()]
+    
+    def _load_partitions(self, conn: sqlite3.Connection) -> None:
+        """Refresh the cached set of partition tables from the schema."""
+        partitions = set(self._read_partitions(conn))
+        with self._schema_lock:
+            self._partitions = partitions
+    
+    def _pending_schema(self) -> Dict[str, Any]:
+        """Get the partitions and resort ids this thread created but has not committed."""
+        pending = self._uncommitted.__dict__
+        if "partitions" not in pending:
+            pending["partitions"] = set()
+            pending["resort_ids"] = {}
+        return pending
+    
+    def _publish_schema(self) -> None:
+        """Add this thread's newly committed partitions and resort ids to the shared caches."""
+        pending = self._pending_schema()
+        if not pending["partitions"] and not pending["resort_ids"]:
+            return
+        with self._schema_lock:
+            self._partitions.update(pending["partitions"])
+            self._resort_ids.update(pending["resort_ids"])
+        pending["partitions"].clear()
+        pending["resort_ids"].clear()
+    
+    def _reload_schema_cache(self) -> None:
+        """Resync cached partitions and resort ids after a rolled-back write may have undone them."""
+        pending = self._pending_schema()
+        pending["partitions"].clear()
+        pending["resort_ids"].clear()
+        with self._schema_lock:
+            self._resort_ids.clear()
+        with self.get_connection() as conn:
+            self._load_partitions(conn)
+    
+    def _migrate_legacy_table(self, conn: sqlite3.Connection) -> None:
+        """Move rows from the old single snow_forecast table into monthly partitions.
+        
+        Partitions are written in the v1 layout (TEXT region and date);
+        ``_migrate_compact_keys`` converts them afterwards.
+        """
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Checked under the write lock: another worker starting at the same
+            # time may already have moved and dropped the table
+            cursor = conn.execute("""
+                SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?
+            """, (LEGACY_TABLE,))
+            if cursor.fetchone() is None:
+                conn.commit()
+                return
+            
+            cursor = conn.execute(f"""
+                SELECT DISTINCT substr(date, 1, 7) AS period FROM {LEGACY_TABLE}
+            """)
+            periods = [row["period"] for row in cursor.fetchall() if row["period"]]
+            for period in periods:
+                table = self._partition_name(period)
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
                         region TEXT,
                         date TEXT,
                         snowfall REAL,
@@ -30,18 +198,131 @@ class DatabaseManager:
                         PRIMARY KEY(region, date)
                     )
                 """)
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO {table} (region, date, snowfall, created_at, updated_at)
+                    SELECT region, date, snowfall, created_at, updated_at
+                    FROM {LEGACY_TABLE}
+                    WHERE substr(date, 1, 7) = ?
+                """, (period,))
+            
+            conn.execute(f"DROP TABLE {LEGACY_TABLE}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"Migrated legacy forecast table into {len(periods)} monthly partitions")
+    
+    def _migrate_compact_keys(self, conn: sqlite3.Connection) -> None:
+        """Rewrite TEXT-keyed partitions as WITHOUT ROWID tables keyed by resort id and day.
+        
+        Each partition is converted in its own short transaction, so readers
+        keep working throughout and an interrupted migration resumes with the
+        partitions it had not reached yet.
+        """
+        conn.commit()
+        for table in self._read_partitions(conn):
+            staging = f"migrating_{table}"
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Checked under the write lock: another worker starting at the
+                # same time may have converted this partition already
+                columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if "region" not in columns:
+                    conn.commit()
+                    continue
                 
-                # Create index for better query performance
-                conn.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_region_date 
-                    ON snow_forecast(region, date)
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO resorts (name)
+                    SELECT DISTINCT region FROM {table} WHERE region IS NOT NULL
                 """)
-                
+                conn.execute(PARTITION_DDL.format(table=staging))
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO {staging} (resort_id, day, snowfall, created_at, updated_at)
+                    SELECT r.id, {EPOCH_DAY_SQL.format(column="f.date")}, f.snowfall, f.created_at, f.updated_at
+                    FROM {table} f
+                    JOIN resorts r ON r.name = f.region
+                """)
+                # Dropping the old table also drops its redundant region/date index
+                conn.execute(f"DROP TABLE {table}")
+                conn.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+                conn.execute(PARTITION_INDEX_DDL.format(table=table))
                 conn.commit()
-                logger.info("Database initialized successfully")
-        except Exception as e:
-            logger.error(f"Error initializing database: {e}")
-            raise
+            except Exception:
+                conn.rollback()
+                raise
+            logger.info(f"Converted partition {table} to compact keys")
+    
+    @staticmethod
+    def _partition_name(date: str) -> str:
+        """Get the partition table name for an ISO date (or YYYY-MM period)."""
+        return f"{PARTITION_PREFIX}{date[:4]}_{date[5:7]}"
+    
+    def _ensure_partition(self, conn: sqlite3.Connection, date: str) -> str:
+        """Create the monthly partition holding ``date`` if it does not exist yet."""
+        table = self._partition_name(date)
+        pending = self._pending_schema()
+        with self._schema_lock:
+            known = table in self._partitions
+        if known or table in pending["partitions"]:
+            return table
+        
+        conn.execute(PARTITION_DDL.format(table=table))
+        conn.execute(PARTITION_INDEX_DDL.format(table=table))
+        
+        # Published to other threads by _publish_schema once the transaction commits
+        pending["partitions"].add(table)
+        return table
+    
+    def _resort_id(self, conn: sqlite3.Connection, name: str, create: bool = True) -> Optional[int]:
+        """Get the integer id for a resort name, registering it when ``create`` is set."""
+        pending = self._pending_schema()
+        with self._schema_lock:
+            resort_id = self._resort_ids.get(name)
+        if resort_id is None:
+            resort_id = pending["resort_ids"].get(name)
+        if resort_id is not None:
+            return resort_id
+        
+        inserted = False
+        if create:
+            inserted = conn.execute("INSERT OR IGNORE INTO resorts (name) VALUES (?)", (name,)).rowcount > 0
+        row = conn.execute("SELECT id FROM resorts WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        if inserted:
+            # Not visible to other connections until this transaction commits
+            pending["resort_ids"][name] = row[0]
+        else:
+            with self._schema_lock:
+                self._resort_ids[name] = row[0]
+        return row[0]
+    
+    def get_partitions(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                       conn: Optional[sqlite3.Connection] = None) -> List[str]:
+        """Get partition tables overlapping the given ISO date range, oldest first.
+        
+        Read from the schema on every call (on ``conn`` when given), so
+        partitions created or dropped by other processes are seen.
+        """
+        if conn is None:
+            with self.get_connection() as conn:
+                return self.list_partitions(conn, start_date, end_date)
+        return self.list_partitions(conn, start_date, end_date)
+    
+    @staticmethod
+    def list_partitions(conn: sqlite3.Connection, start_date: Optional[str] = None,
+                        end_date: Optional[str] = None) -> List[str]:
+        """Get partition tables overlapping an ISO date range from any connection, oldest first.
+        
+        Needs no manager, so tools that must not migrate or write (like the
+        export script) list partitions the same way the server does.
+        """
+        low = DatabaseManager._partition_name(start_date) if start_date else None
+        high = DatabaseManager._partition_name(end_date) if end_date else None
+        return [
+            table for table in DatabaseManager._read_partitions(conn)
+            if (low is None or table >= low) and (high is None or table <= high)
+        ]
     
     @contextmanager
     def get_connection(self):
@@ -60,19 +341,59 @@ class DatabaseManager:
             if conn:
                 conn.close()
     
+    def _write_forecast(self, conn: sqlite3.Connection, region: str, date: str, snowfall: float) -> bool:
+        """Write one forecast row on an open connection without committing."""
+        table = self._ensure_partition(conn, date)
+        resort_id = self._resort_id(conn, region)
+        conn.execute(f"""
+            INSERT INTO {table} (resort_id, day, snowfall)
+            VALUES (?, ?, ?)
+            ON CONFLICT(resort_id, day) DO UPDATE SET
+                snowfall = excluded.snowfall,
+                updated_at = CURRENT_TIMESTAMP
+        """, (resort_id, to_epoch_day(date), snowfall))
+        return True
+    
     def insert_forecast(self, region: str, date: str, snowfall: float) -> bool:
         """Insert or update forecast data."""
-        try:
-            with self.get_connection() as conn:
-                conn.execute("""
-                    INSERT OR REPLACE INTO snow_forecast (region, date, snowfall, updated_at)
-                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-                """, (region, date, snowfall))
-                conn.commit()
+        for attempt in range(2):
+            try:
+                with self.get_connection() as conn:
+                    self._write_forecast(conn, region, date, snowfall)
+                    conn.commit()
+                self._publish_schema()
                 return True
-        except Exception as e:
-            logger.error(f"Error inserting forecast: {e}")
-            return False
+            except sqlite3.OperationalError as e:
+                self._reload_schema_cache()
+                # Another process dropped a partition we had cached: retry once
+                if attempt == 0 and "no such table" in str(e):
+                    continue
+                logger.error(f"Error inserting forecast: {e}")
+                return False
+            except Exception as e:
+                logger.error(f"Error inserting forecast: {e}")
+                self._reload_schema_cache()
+                return False
+        return False
+    
+    def submit_write(self, operation: WriteOperation, key: Optional[Any] = None) -> Future:
+        """Queue a write for the background writer; the future resolves once committed."""
+        return self.writer.submit(operation, key)
+    
+    def queue_forecast(self, region: str, date: str, snowfall: float) -> Future:
+        """Queue an insert or update of forecast data without waiting for the commit."""
+        return self.submit_write(
+            lambda conn: self._write_forecast(conn, region, date, snowfall),
+            key=("snow_forecast", region, date)
+        )
+    
+    def flush_writes(self, timeout: Optional[float] = None) -> None:
+        """Wait for all queued writes to be committed."""
+        self.writer.flush(timeout)
+    
+    def close(self) -> None:
+        """Commit queued writes and stop the background writer."""
+        self.writer.close()
     
     def get_top_snow(self, days: int = 3, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top snow regions for specified days."""
@@ -81,14 +402,29 @@ class DatabaseManager:
             end_date = (datetime.now().date() + timedelta(days=days-1)).isoformat()
             
             with self.get_connection() as conn:
-                cursor = conn.execute("""
-                    SELECT region, SUM(snowfall) as total_snowfall
-                    FROM snow_forecast
-                    WHERE date BETWEEN ? AND ?
-                    GROUP BY region
-                    ORDER BY total_snowfall DESC
+                partitions = self.get_partitions(start_date, end_date, conn)
+                if not partitions:
+                    return []
+                
+                # Only scan the monthly partitions that overlap the requested range;
+                # each scan is an index-only range read of idx_*_day_resort
+                union = " UNION ALL ".join(
+                    f"SELECT resort_id, snowfall FROM {table} WHERE day BETWEEN ? AND ?"
+                    for table in partitions
+                )
+                params = [to_epoch_day(start_date), to_epoch_day(end_date)] * len(partitions)
+                
+                cursor = conn.execute(f"""
+                    SELECT r.name AS region, totals.total_snowfall
+                    FROM (
+                        SELECT resort_id, SUM(snowfall) AS total_snowfall
+                        FROM ({union})
+                        GROUP BY resort_id
+                    ) totals
+                    JOIN resorts r ON r.id = totals.resort_id
+                    ORDER BY totals.total_snowfall DESC
                     LIMIT ?
-                """, (start_date, end_date, limit))
+                """, (*params, limit))
                 
                 results = cursor.fetchall()
                 return [dict(row) for row in results]
@@ -103,34 +439,56 @@ class DatabaseManager:
             end_date = (datetime.now().date() + timedelta(days=days-1)).isoformat()
             
             with self.get_connection() as conn:
-                cursor = conn.execute("""
-                    SELECT date, snowfall
-                    FROM snow_forecast
-                    WHERE region = ? AND date BETWEEN ? AND ?
-                    ORDER BY date
-                """, (region, start_date, end_date))
+                partitions = self.get_partitions(start_date, end_date, conn)
+                if not partitions:
+                    return []
                 
-                results = cursor.fetchall()
-                return [dict(row) for row in results]
+                resort_id = self._resort_id(conn, region, create=False)
+                if resort_id is None:
+                    return []
+                
+                # Primary key range scans: the rows are clustered by resort and day
+                union = " UNION ALL ".join(
+                    f"SELECT day, snowfall FROM {table} WHERE resort_id = ? AND day BETWEEN ? AND ?"
+                    for table in partitions
+                )
+                params = [resort_id, to_epoch_day(start_date), to_epoch_day(end_date)] * len(partitions)
+                cursor = conn.execute(f"""
+                    SELECT day, snowfall
+                    FROM ({union})
+                    ORDER BY day
+                """, params)
+                
+                return [
+                    {"date": from_epoch_day(row["day"]), "snowfall": row["snowfall"]}
+                    for row in cursor.fetchall()
+                ]
         except Exception as e:
             logger.error(f"Error getting region forecast: {e}")
             return []
     
     def cleanup_old_data(self, days_to_keep: int = 30) -> bool:
-        """Clean up old forecast data."""
+        """Drop monthly partitions that lie entirely before the retention cutoff.
+        
+        Rows in the month containing the cutoff are kept until that whole month
+        expires; every query filters by date, so they are never served.
+        """
         try:
             cutoff_date = (datetime.now().date() - timedelta(days=days_to_keep)).isoformat()
-            
+            cutoff_partition = self._partition_name(cutoff_date)
             with self.get_connection() as conn:
-                cursor = conn.execute("""
-                    DELETE FROM snow_forecast 
-                    WHERE date < ?
-                """, (cutoff_date,))
+                expired = [table for table in self.get_partitions(conn=conn) if table < cutoff_partition]
+                if not expired:
+                    return True
                 
-                deleted_count = cursor.rowcount
+                for table in expired:
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
                 conn.commit()
-                logger.info(f"Cleaned up {deleted_count} old records")
-                return True
+            with self._schema_lock:
+                self._partitions.difference_update(expired)
+            
+            logger.info(f"Dropped {len(expired)} expired forecast partitions")
+            return True
         except Exception as e:
             logger.error(f"Error cleaning up old data: {e}")
             return False
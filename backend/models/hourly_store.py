@@ -0,0 +1,164 @@
+"""
+Columnar on-disk store for hourly forecast series.
+
+Each resort x model x variable is one file of native float32 values on a
+shared hourly time axis: value ``i`` is the hour ``axis_start + i hours``
+(UTC) in every file, so a time window is the same byte range everywhere.
+Hours that were never fetched hold NaN. Reads go through ``mmap`` and
+return ``memoryview`` slices of the mapping, so serving a window copies
+nothing until the caller converts it.
+"""
+import logging
+import math
+import mmap
+import os
+import re
+import threading
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from config import HOURLY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+VALUE_SIZE = array("f").itemsize
+FILE_SUFFIX = ".f32"
+
+_NAN = array("f", [math.nan])
+
+class HourlyStore:
+    """Fixed-width float32 columns per resort, model and variable."""
+
+    def __init__(self, directory: str = HOURLY_CONFIG["directory"],
+                 axis_start: str = HOURLY_CONFIG["axis_start"]):
+        self.directory = directory
+        self.axis_start = datetime.fromisoformat(axis_start)
+        if self.axis_start.tzinfo is None:
+            self.axis_start = self.axis_start.replace(tzinfo=timezone.utc)
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._write_lock = threading.Lock()
+        self._map_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _slug(name: str) -> str:
+        """Filesystem-safe name for a resort, model or variable."""
+        return re.sub(r"[^a-z0-9_]+", "-", name.lower()).strip("-")
+
+    def _path(self, resort: str, model: str, variable: str) -> str:
+        return os.path.join(self.directory, self._slug(resort), self._slug(model),
+                            self._slug(variable) + FILE_SUFFIX)
+
+    def hour_index(self, when: datetime) -> int:
+        """Get the axis position of an hour (naive datetimes are taken as UTC)."""
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return int((when - self.axis_start).total_seconds() // 3600)
+
+    def time_at(self, index: int) -> datetime:
+        """Get the UTC hour at an axis position."""
+        return self.axis_start + timedelta(hours=index)
+
+    def write_series(self, resort: str, model: str, variable: str,
+                     start_index: int, values: Sequence[Optional[float]]) -> None:
+        """Write consecutive hourly values starting at an axis position.
+
+        Missing values are stored as NaN, as is any gap between the current
+        end of the column and ``start_index``.
+        """
+        if start_index < 0:
+            raise ValueError("Hourly series starts before the store's time axis")
+
+        path = self._path(resort, model, variable)
+        encoded = array("f", (math.nan if value is None else value for value in values))
+        with self._write_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "r+b" if os.path.exists(path) else "w+b") as handle:
+                length = handle.seek(0, os.SEEK_END) // VALUE_SIZE
+                if start_index > length:
+                    handle.write((_NAN * (start_index - length)).tobytes())
+                # Existing mappings share the page cache, so readers see the new values
+                handle.seek(start_index * VALUE_SIZE)
+                handle.write(encoded.tobytes())
+
+    def write_response(self, resort: str, model: str, data: Optional[Dict[str, Any]]) -> int:
+        """Store the ``hourly`` block of an Open-Meteo response and return the hours written.
+
+        Times in the response are local to the resort; ``utc_offset_seconds``
+        moves them onto the UTC axis.
+        """
+        if not data or not data.get("hourly") or not data["hourly"].get("time"):
+            return 0
+
+        hourly = data["hourly"]
+        offset = timedelta(seconds=data.get("utc_offset_seconds", 0))
+        first_hour = datetime.fromisoformat(hourly["time"][0]) - offset
+        start_index = self.hour_index(first_hour)
+
+        for variable, values in hourly.items():
+            if variable != "time" and values:
+                self.write_series(resort, model, variable, start_index, values)
+
+        logger.info(f"Stored {len(hourly['time'])} hours of {model} data for {resort}")
+        return len(hourly["time"])
+
+    def _mapping(self, path: str, min_length: int) -> Optional[mmap.mmap]:
+        """Get a read-only mapping of a column, remapping if the file has grown."""
+        with self._map_lock:
+            mapped = self._maps.get(path)
+            if mapped is not None and len(mapped) >= min_length:
+                return mapped
+
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return None
+            if size == 0:
+                return None
+            if mapped is not None and len(mapped) == size:
+                return mapped
+
+            with open(path, "rb") as handle:
+                mapped = mmap.mmap(handle.fileno(), size, access=mmap.ACCESS_READ)
+            # The old mapping is freed once no window still references it
+            self._maps[path] = mapped
+            return mapped
+
+    def window(self, resort: str, model: str, variable: str,
+               start_index: int, hours: int) -> memoryview:
+        """Get up to ``hours`` values from an axis position as a zero-copy float32 view.
+
+        The view is shorter than requested where the column has no data yet.
+        """
+        if start_index < 0:
+            raise ValueError("Window starts before the store's time axis")
+
+        path = self._path(resort, model, variable)
+        end = (start_index + hours) * VALUE_SIZE
+        mapped = self._mapping(path, end)
+        if mapped is None:
+            return memoryview(b"").cast("f")
+
+        start = min(start_index * VALUE_SIZE, len(mapped))
+        end = min(end, len(mapped))
+        return memoryview(mapped)[start:end].cast("f")
+
+    def variables(self, resort: str, model: str) -> List[str]:
+        """Get the variables stored for a resort and model."""
+        directory = os.path.join(self.directory, self._slug(resort), self._slug(model))
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        return sorted(name[:-len(FILE_SUFFIX)] for name in names if name.endswith(FILE_SUFFIX))
+
+    def close(self) -> None:
+        """Release mappings that no window still references."""
+        with self._map_lock:
+            for mapped in self._maps.values():
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass
+            self._maps.clear()
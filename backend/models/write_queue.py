@@ -0,0 +1,172 @@
+"""
+Write-behind queue serializing all database writes onto one writer thread.
+"""
+import sqlite3
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WriteOperation = Callable[[sqlite3.Connection], Any]
+
+_STOP = object()
+
+class WriteBehindQueue:
+    """Feeds write operations from a bounded queue to a single writer thread.
+
+    Operations are drained in batches (up to ``batch_size`` items, or whatever
+    arrives within ``flush_interval`` seconds of the first) and committed in one
+    transaction, so many small writes cost one fsync. Operations submitted with
+    the same key coalesce: only the latest one in a batch runs, and every
+    superseded future resolves with its result.
+    """
+
+    def __init__(self, database_path: str, max_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.05, put_timeout: float = 5.0,
+                 on_rollback: Optional[Callable[[], None]] = None,
+                 on_commit: Optional[Callable[[], None]] = None):
+        self.database_path = database_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.on_rollback = on_rollback
+        self.on_commit = on_commit
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        """Start the writer thread on first use."""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, operation: WriteOperation, key: Optional[Hashable] = None) -> Future:
+        """Queue a write and get a future that resolves once it is committed.
+
+        Blocks for up to ``put_timeout`` seconds when the queue is full and then
+        raises ``queue.Full``, pushing back on producers that outpace the writer.
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((key, operation, future), timeout=self.put_timeout)
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until everything queued so far has been committed."""
+        self.submit(lambda conn: None).result(timeout=timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Commit outstanding writes and stop the writer thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def pending(self) -> int:
+        """Approximate number of queued writes."""
+        return self._queue.qsize()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the writer's own connection with explicit transaction control."""
+        conn = sqlite3.connect(self.database_path, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 5000")
+        # In WAL mode NORMAL only syncs at checkpoints and stays crash-safe
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _next_batch(self) -> Tuple[List[Tuple[Any, WriteOperation, Future]], bool]:
+        """Block for the first item, then gather more until the size or time trigger."""
+        items = [self._queue.get()]
+        if items[0] is _STOP:
+            return [], True
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _run(self) -> None:
+        """Writer thread main loop."""
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                items, stopping = self._next_batch()
+                if items:
+                    self._write_batch(conn, items)
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection,
+                     items: List[Tuple[Any, WriteOperation, Future]]) -> None:
+        """Commit one batch, falling back to one transaction per write on failure."""
+        # Coalesce by key: the last write wins, earlier ones share its outcome
+        latest: Dict[Hashable, int] = {}
+        for position, (key, _, _) in enumerate(items):
+            if key is not None:
+                latest[key] = position
+        runs: List[Tuple[WriteOperation, List[Future]]] = []
+        run_of: Dict[int, int] = {}
+        for position, (key, operation, future) in enumerate(items):
+            if key is None or latest[key] == position:
+                run_of[position] = len(runs)
+                runs.append((operation, [future]))
+        for position, (key, _, future) in enumerate(items):
+            if key is not None and latest[key] != position:
+                runs[run_of[latest[key]]][1].append(future)
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            results = [operation(conn) for operation, _ in runs]
+            conn.execute("COMMIT")
+            if self.on_commit:
+                self.on_commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            if self.on_rollback:
+                self.on_rollback()
+            logger.warning(f"Batched write of {len(runs)} operations failed ({e}), retrying individually")
+            for operation, futures in runs:
+                self._write_single(conn, operation, futures)
+            return
+
+        for (_, futures), result in zip(runs, results):
+            for future in futures:
+                future.set_result(result)
+
+    def _write_single(self, conn: sqlite3.Connection, operation: WriteOperation,
+                      futures: List[Future]) -> None:
+        """Commit a single write in its own transaction."""
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            result = operation(conn)
+            conn.execute("COMMIT")
+            if self.on_commit:
+                self.on_commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            if self.on_rollback:
+                self.on_rollback()
+            logger.error(f"Queued write failed: {e}")
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future in futures:
+            future.set_result(result)
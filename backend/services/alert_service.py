@@ -0,0 +1,274 @@
+"""
+Powder alert rules engine.
+
+Rules are kept in memory, indexed by scope (resort, country or any resort)
+and window length, with thresholds sorted per group. Evaluating a refresh
+computes each window total once per changed resort and finds every rule it
+satisfies with a single bisect, so cost does not grow with the rule count.
+"""
+import bisect
+import json
+import logging
+import queue
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timezone
+
+import requests
+
+from backend.models.database import DatabaseManager
+from config import ALERT_CONFIG, WEATHER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ("resort", "country", "any")
+
+class AlertSink(ABC):
+    """Destination for fired alerts."""
+
+    @abstractmethod
+    def deliver(self, alerts: List[Dict[str, Any]]) -> None:
+        """Hand off a batch of fired alerts. May block, so call it off the event loop."""
+
+class FileAlertSink(AlertSink):
+    """Appends alerts to a newline-delimited JSON file."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+
+    def deliver(self, alerts: List[Dict[str, Any]]) -> None:
+        with self._lock, open(self.file_path, "a", encoding="utf-8") as handle:
+            for alert in alerts:
+                handle.write(json.dumps(alert) + "\n")
+
+class QueueAlertSink(AlertSink):
+    """Puts alerts on an in-process queue for another consumer."""
+
+    def __init__(self, alert_queue: Optional[queue.Queue] = None):
+        self.queue = alert_queue if alert_queue is not None else queue.Queue()
+
+    def deliver(self, alerts: List[Dict[str, Any]]) -> None:
+        for alert in alerts:
+            self.queue.put(alert)
+
+class WebhookAlertSink(AlertSink):
+    """Posts each batch of alerts as JSON to a webhook URL."""
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, alerts: List[Dict[str, Any]]) -> None:
+        try:
+            response = requests.post(self.url, json={"alerts": alerts}, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to deliver {len(alerts)} alerts to webhook: {e}")
+
+def create_alert_sink(config: Dict[str, Any] = ALERT_CONFIG) -> AlertSink:
+    """Build the alert sink selected in configuration."""
+    sink = config.get("sink", "file")
+    if sink == "webhook":
+        return WebhookAlertSink(config["webhook_url"])
+    if sink == "queue":
+        return QueueAlertSink()
+    return FileAlertSink(config.get("file_path", "alerts.ndjson"))
+
+class AlertEngine:
+    """Stores powder alert rules and evaluates them against refreshed forecasts."""
+
+    def __init__(self, db_manager: DatabaseManager, sink: Optional[AlertSink] = None):
+        self.db_manager = db_manager
+        self.sink = sink or create_alert_sink()
+        self._lock = threading.Lock()
+        self._rules: Dict[int, Dict[str, Any]] = {}
+        # (scope, target) -> window_days -> (sorted thresholds, matching rule ids)
+        self._index: Dict[Tuple[str, Optional[str]], Dict[int, Tuple[List[float], List[int]]]] = {}
+        # resort -> rule ids currently satisfied, so each rule fires once per storm
+        self._active: Dict[str, set] = {}
+        self._initialize_tables()
+        self._load_rules()
+
+    def _initialize_tables(self) -> None:
+        """Initialize alert rule table."""
+        try:
+            with self.db_manager.get_connection() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS alert_rules (
+                        rule_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        scope TEXT NOT NULL,
+                        target TEXT,
+                        window_days INTEGER NOT NULL,
+                        threshold_cm REAL NOT NULL,
+                        label TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Error initializing alert rules: {e}")
+            raise
+
+    def _load_rules(self) -> None:
+        """Load all stored rules into the in-memory index."""
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.execute("""
+                SELECT rule_id, scope, target, window_days, threshold_cm, label
+                FROM alert_rules
+            """)
+            rules = [dict(row) for row in cursor.fetchall()]
+
+        with self._lock:
+            self._rules = {rule["rule_id"]: rule for rule in rules}
+            self._rebuild_index()
+        logger.info(f"Loaded {len(rules)} alert rules")
+
+    def _rebuild_index(self) -> None:
+        """Rebuild the scope/window index from all rules. Caller holds the lock."""
+        self._index = {}
+        for rule in self._rules.values():
+            self._index_rule(rule)
+
+    def _index_rule(self, rule: Dict[str, Any]) -> None:
+        """Insert a rule into its sorted threshold group. Caller holds the lock."""
+        windows = self._index.setdefault((rule["scope"], rule["target"]), {})
+        thresholds, rule_ids = windows.setdefault(rule["window_days"], ([], []))
+        position = bisect.bisect_right(thresholds, rule["threshold_cm"])
+        thresholds.insert(position, rule["threshold_cm"])
+        rule_ids.insert(position, rule["rule_id"])
+
+    def _unindex_rule(self, rule: Dict[str, Any]) -> None:
+        """Remove a rule from its threshold group. Caller holds the lock."""
+        thresholds, rule_ids = self._index[(rule["scope"], rule["target"])][rule["window_days"]]
+        low = bisect.bisect_left(thresholds, rule["threshold_cm"])
+        high = bisect.bisect_right(thresholds, rule["threshold_cm"])
+        position = rule_ids.index(rule["rule_id"], low, high)
+        del thresholds[position]
+        del rule_ids[position]
+
+    @staticmethod
+    def _normalize_rule(rule: Dict[str, Any]) -> Tuple[str, Optional[str], int, float, Optional[str]]:
+        """Validate a rule definition and normalize its scope target."""
+        scope = rule.get("scope", "resort")
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown alert scope: {scope}")
+        target = rule.get("target")
+        if scope == "any":
+            target = None
+        elif not target:
+            raise ValueError(f"Alert scope '{scope}' requires a target")
+        else:
+            target = target.lower()
+
+        window_days = int(rule["window_days"])
+        if window_days < 1:
+            raise ValueError("window_days must be at least 1")
+        # Longer windows could never see more than the fetched forecast
+        if window_days > WEATHER_CONFIG["forecast_days"]:
+            raise ValueError(f"window_days must be at most {WEATHER_CONFIG['forecast_days']}")
+        return scope, target, window_days, float(rule["threshold_cm"]), rule.get("label")
+
+    def add_rules(self, rules: List[Dict[str, Any]]) -> List[int]:
+        """Store a batch of rules and add them to the index."""
+        rows = [self._normalize_rule(rule) for rule in rules]
+        rule_ids = []
+        with self.db_manager.get_connection() as conn:
+            for row in rows:
+                cursor = conn.execute("""
+                    INSERT INTO alert_rules (scope, target, window_days, threshold_cm, label)
+                    VALUES (?, ?, ?, ?, ?)
+                """, row)
+                rule_ids.append(cursor.lastrowid)
+            conn.commit()
+
+        with self._lock:
+            for rule_id, (scope, target, window_days, threshold_cm, label) in zip(rule_ids, rows):
+                rule = {
+                    "rule_id": rule_id,
+                    "scope": scope,
+                    "target": target,
+                    "window_days": window_days,
+                    "threshold_cm": threshold_cm,
+                    "label": label,
+                }
+                self._rules[rule_id] = rule
+                self._index_rule(rule)
+        return rule_ids
+
+    def add_rule(self, rule: Dict[str, Any]) -> int:
+        """Store a single rule."""
+        return self.add_rules([rule])[0]
+
+    def remove_rule(self, rule_id: int) -> bool:
+        """Delete a rule."""
+        with self._lock:
+            if rule_id not in self._rules:
+                return False
+
+        with self.db_manager.get_connection() as conn:
+            conn.execute("DELETE FROM alert_rules WHERE rule_id = ?", (rule_id,))
+            conn.commit()
+
+        with self._lock:
+            rule = self._rules.pop(rule_id, None)
+            if rule is not None:
+                self._unindex_rule(rule)
+            for active in self._active.values():
+                active.discard(rule_id)
+        return True
+
+    def get_rules(self) -> List[Dict[str, Any]]:
+        """Get all rules."""
+        with self._lock:
+            return sorted(self._rules.values(), key=lambda rule: rule["rule_id"])
+
+    def evaluate(self, forecasts: Dict[str, List[float]],
+                 resorts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Evaluate rules for refreshed resorts and deliver newly satisfied alerts.
+
+        ``forecasts`` maps resort name to its daily snowfall series in cm, starting
+        today. Only resorts present in it are evaluated.
+        """
+        countries = {resort["name"]: resort.get("country", "") for resort in resorts}
+        issued_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        fired = []
+
+        with self._lock:
+            for name, series in forecasts.items():
+                # Prefix sums give every window total in constant time
+                totals = [0.0]
+                for snow in series:
+                    totals.append(totals[-1] + (snow or 0.0))
+
+                keys = (("resort", name.lower()), ("country", countries.get(name, "").lower()), ("any", None))
+                satisfied = set()
+                for key in keys:
+                    for window_days, (thresholds, rule_ids) in self._index.get(key, {}).items():
+                        total = totals[min(window_days, len(series))]
+                        met = bisect.bisect_right(thresholds, total)
+                        for position in range(met):
+                            satisfied.add(rule_ids[position])
+
+                previous = self._active.get(name, set())
+                for rule_id in satisfied - previous:
+                    rule = self._rules[rule_id]
+                    fired.append({
+                        "rule_id": rule_id,
+                        "label": rule["label"],
+                        "resort": name,
+                        "window_days": rule["window_days"],
+                        "threshold_cm": rule["threshold_cm"],
+                        "forecast_cm": round(totals[min(rule["window_days"], len(series))], 1),
+                        "issued_at": issued_at,
+                    })
+                self._active[name] = satisfied
+
+        if fired:
+            logger.info(f"Delivering {len(fired)} powder alerts")
+            try:
+                self.sink.deliver(fired)
+            except Exception as e:
+                logger.error(f"Error delivering powder alerts: {e}")
+        return fired
@@ -0,0 +1,215 @@
+"""
+Server-side rendering of the forecast and home pages.
+
+Each HTML file is compiled once into static chunks and named slots. A render
+fills the slots from the current forecast snapshot and is cached per
+snapshot version, so pages arrive with the forecast table and resort list
+already in place and the browser makes no API calls on first paint.
+"""
+import html
+import json
+import logging
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+from backend.services.weather_service import WeatherService, MODELS
+from config import WEATHER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_ELEMENT_ID = "skistoke-bootstrap"
+
+# Slot name -> pattern whose "slot" group is replaced on render
+FORECASTS_SLOTS = {
+    **{
+        f"day_{day}": rf'<th id="day-{day}">(?P<slot>Loading\.\.\.)</th>'
+        for day in range(1, WEATHER_CONFIG["forecast_days"] + 1)
+    },
+    "table_rows": r'<tbody id="snow-table-body">(?P<slot>.*?)</tbody>',
+    "summary": r'<div class="summary-grid" id="summary-grid">(?P<slot>.*?)</div>',
+    "bootstrap": r'(?P<slot>)<script src="js/app.js"></script>',
+}
+
+INDEX_SLOTS = {
+    "bootstrap": r'(?P<slot>)<script>\s*// Ski resort data',
+}
+
+ROW_LABELS = (("gfs", "GFS", "gfs-row"), ("openMeteo", "Open-Meteo", "openmeteo-row"), ("average", "Average", "average-row"))
+
+class PageTemplate:
+    """An HTML file split once into static chunks around named slots."""
+
+    def __init__(self, path: str, slots: Dict[str, str]):
+        with open(path, encoding="utf-8") as handle:
+            text = handle.read()
+
+        spans = []
+        for name, pattern in slots.items():
+            match = re.search(pattern, text, re.DOTALL)
+            if match is None:
+                raise ValueError(f"Slot '{name}' not found in template {path}")
+            spans.append((match.start("slot"), match.end("slot"), name))
+        spans.sort()
+
+        self.chunks: List[str] = []
+        self.slot_names: List[str] = []
+        position = 0
+        for start, end, name in spans:
+            self.chunks.append(text[position:start])
+            self.slot_names.append(name)
+            position = end
+        self.chunks.append(text[position:])
+
+    def render(self, values: Dict[str, str]) -> str:
+        """Fill every slot and join the chunks."""
+        parts = [self.chunks[0]]
+        for name, chunk in zip(self.slot_names, self.chunks[1:]):
+            parts.append(values[name])
+            parts.append(chunk)
+        return "".join(parts)
+
+def _intensity_class(snow_amount: float) -> str:
+    """Same bands as SkiStokeApp.getIntensityClass."""
+    if snow_amount >= 20:
+        return "intensity-very-high"
+    if snow_amount >= 15:
+        return "intensity-high"
+    if snow_amount >= 10:
+        return "intensity-medium"
+    if snow_amount >= 5:
+        return "intensity-low"
+    return "intensity-none"
+
+def _json_for_script(payload: Dict[str, Any]) -> str:
+    """Serialize JSON so it cannot close the surrounding script element."""
+    return json.dumps(payload, separators=(",", ":")).replace("</", "<\\/")
+
+class PageRenderer:
+    """Renders pages from the latest forecast snapshot, caching each snapshot version."""
+
+    def __init__(self, weather_service: WeatherService, resorts: List[Dict[str, Any]]):
+        self.weather_service = weather_service
+        self.resorts = resorts
+        self.templates = {
+            "forecasts.html": PageTemplate("forecasts.html", FORECASTS_SLOTS),
+            "index.html": PageTemplate("index.html", INDEX_SLOTS),
+        }
+        self._cache: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def _snapshot(self) -> Tuple[str, Dict[str, Optional[Dict[str, Any]]]]:
+        """Get the current snapshot version and the latest forecast per resort."""
+        forecasts = {
+            resort["name"]: self.weather_service.get_latest_forecast(resort["name"])
+            for resort in self.resorts
+        }
+        fingerprints = {
+            name: forecast.get("fingerprint") if forecast else None
+            for name, forecast in forecasts.items()
+        }
+        # Day headers depend on the date even when no forecast has changed
+        fingerprints["_date"] = datetime.now().date().isoformat()
+        return self.weather_service.combine_fingerprints(fingerprints), forecasts
+
+    def render(self, page: str) -> Tuple[str, str]:
+        """Get the rendered page and its version (usable as an ETag)."""
+        version, forecasts = self._snapshot()
+        with self._lock:
+            cached = self._cache.get(page)
+            if cached is not None and cached[0] == version:
+                return cached[1], version
+
+        if page == "forecasts.html":
+            values = self._forecasts_values(version, forecasts)
+        else:
+            values = {"bootstrap": self._bootstrap(version, False)}
+        rendered = self.templates[page].render(values)
+
+        with self._lock:
+            self._cache[page] = (version, rendered)
+        logger.info(f"Rendered {page} for snapshot {version[:8]}")
+        return rendered, version
+
+    def _bootstrap(self, version: str, forecasts_rendered: bool) -> str:
+        """Inline JSON the client reads instead of calling /api/resorts."""
+        payload = {
+            "version": version,
+            "forecastsRendered": forecasts_rendered,
+            "resorts": [dict(resort, slug=resort["name"].lower()) for resort in self.resorts],
+        }
+        return (
+            f'<script id="{BOOTSTRAP_ELEMENT_ID}" type="application/json">'
+            f"{_json_for_script(payload)}</script>\n  "
+        )
+
+    def _forecasts_values(self, version: str,
+                          forecasts: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, str]:
+        """Slot values for forecasts.html."""
+        days = WEATHER_CONFIG["forecast_days"]
+        today = datetime.now().date()
+        values = {}
+        for day in range(days):
+            date = today + timedelta(days=day)
+            values[f"day_{day + 1}"] = (
+                f'<div class="day-name">{date.strftime("%a")}</div>'
+                f'<div class="day-date">{date.strftime("%b")} {date.day}</div>'
+            )
+
+        rows = []
+        cards = []
+        for resort in self.resorts:
+            forecast = forecasts.get(resort["name"])
+            if forecast is None:
+                continue
+            series = {
+                model: self.weather_service.process_snowfall_data(forecast.get(model))
+                for model in MODELS
+            }
+            series["average"] = [(gfs + open_meteo) / 2 for gfs, open_meteo in zip(series["gfs"], series["openMeteo"])]
+            for position, (key, label, row_class) in enumerate(ROW_LABELS):
+                rows.append(self._table_row(resort, label, series[key][:days], row_class, position == 0))
+            cards.append(self._summary_card(resort, series["average"][:days]))
+
+        values["table_rows"] = "\n" + "\n".join(rows) + "\n" if rows else "\n"
+        values["summary"] = "\n" + "\n".join(cards) + "\n" if cards else "\n"
+        values["bootstrap"] = self._bootstrap(version, bool(rows))
+        return values
+
+    @staticmethod
+    def _table_row(resort: Dict[str, Any], label: str, data: List[float],
+                   row_class: str, is_first_row: bool) -> str:
+        """Markup matching SkiStokeApp.createTableRow."""
+        cells = []
+        if is_first_row:
+            name = html.escape(f"{resort['name']}, {resort['country']}")
+            cells.append(f'<td class="resort-name-cell" rowspan="3"><h4 class="resort-name">{name}</h4></td>')
+        for snow_amount in data:
+            cells.append(
+                '<td class="forecast-cell">'
+                f'<div class="intensity-bg {_intensity_class(snow_amount)}"></div>'
+                f'<div class="snow-amount">{snow_amount:.1f} cm</div>'
+                f'<div class="snow-chart" data-snow="{snow_amount}">'
+                '<div class="chart-bars"><div class="chart-bar"></div><div class="chart-bar"></div><div class="chart-bar"></div></div>'
+                '</div>'
+                f'<div class="data-source">{label}</div>'
+                '</td>'
+            )
+        return f'<tr class="{row_class}">{"".join(cells)}</tr>'
+
+    @staticmethod
+    def _summary_card(resort: Dict[str, Any], average: List[float]) -> str:
+        """Markup matching SkiStokeApp.createSummaryCard."""
+        total_snow = sum(average)
+        max_snow = max(average) if average else 0.0
+        height = (total_snow / max_snow) * 100 if max_snow else 0.0
+        return (
+            '<div class="summary-resort">'
+            f'<h4>{html.escape(resort["name"])}</h4>'
+            f'<div class="summary-chart" data-total="{total_snow}">'
+            f'<div class="summary-bar" style="height: {height}%"></div>'
+            '</div>'
+            f'<div class="summary-total">{total_snow:.1f} cm</div>'
+            '</div>'
+        )
@@ -3,26 +3,257 @@ Weather data fetching and processing service.
 """
 import requests
 import logging
+import hashlib
+import json
+import threading
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta, timezone
 import time
-from config import API_CONFIG, WEATHER_CONFIG
+from collections import deque
+from config import API_CONFIG, WEATHER_CONFIG, REFRESH_CONFIG, HOURLY_CONFIG
+from backend.models.hourly_store import HourlyStore
 
 logger = logging.getLogger(__name__)
 
+MODELS = ("openMeteo", "gfs")
+
+def fingerprint_forecast(data: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Get a content fingerprint for a model response, ignoring volatile metadata."""
+    if not data or "daily" not in data:
+        return None
+    
+    # Only the forecast payload counts; fields like generationtime_ms change every call
+    content = {"daily": data["daily"], "daily_units": data.get("daily_units")}
+    encoded = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+class ChangeTracker:
+    """Remembers the last stored fingerprint per resort and model, and per resort snapshot."""
+    
+    def __init__(self):
+        self._fingerprints: Dict[Tuple[str, str], str] = {}
+        self._snapshots: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def changed_models(self, resort: str, fingerprints: Dict[str, Optional[str]]) -> List[str]:
+        """Get the models whose output differs from what was last stored for a resort.
+        
+        Models that failed to fetch (no fingerprint) never count as changed, so
+        a flaky upstream does not add a run to the archive.
+        """
+        with self._lock:
+            return [
+                model for model, fingerprint in fingerprints.items()
+                if fingerprint is not None and self._fingerprints.get((resort, model)) != fingerprint
+            ]
+    
+    def snapshot_changed(self, resort: str, fingerprints: Dict[str, Optional[str]],
+                         combined: str) -> bool:
+        """Check whether a complete snapshot differs from the one last stored for a resort.
+        
+        Values derived from every model (like the averaged forecast row) are
+        only stored from snapshots where no model failed, so an outage never
+        replaces them with a partial average. The combined fingerprint, not the
+        per-model ones, decides: a model recovering with its old output still
+        differs from the snapshot stored before the outage.
+        """
+        if any(fingerprint is None for fingerprint in fingerprints.values()):
+            return False
+        with self._lock:
+            return self._snapshots.get(resort) != combined
+    
+    def mark_stored(self, resort: str, fingerprints: Dict[str, Optional[str]],
+                    combined: Optional[str] = None) -> None:
+        """Record fingerprints once their data has been written.
+        
+        ``combined`` is the snapshot fingerprint, given when the values derived
+        from the whole snapshot were written too.
+        """
+        with self._lock:
+            for model, fingerprint in fingerprints.items():
+                if fingerprint is not None:
+                    self._fingerprints[(resort, model)] = fingerprint
+            if combined is not None:
+                self._snapshots[resort] = combined
+
+class QuotaManager:
+    """Tracks upstream calls against a daily budget and rolling window budgets."""
+    
+    def __init__(self, daily_limit: int, window_limits: Dict[int, int]):
+        self.daily_limit = daily_limit
+        self.window_limits = dict(window_limits)
+        self._day = None
+        self._used_today = 0
+        self._calls = {window: deque() for window in self.window_limits}
+        self._lock = threading.Lock()
+    
+    def _expire(self, now: float) -> None:
+        """Reset the daily counter at UTC midnight and drop calls outside each window."""
+        today = datetime.fromtimestamp(now, timezone.utc).date()
+        if today != self._day:
+            self._day = today
+            self._used_today = 0
+        for window, calls in self._calls.items():
+            while calls and calls[0] <= now - window:
+                calls.popleft()
+    
+    def _available(self) -> int:
+        """Calls that can still be made right now. Caller holds the lock."""
+        available = self.daily_limit - self._used_today
+        for window, limit in self.window_limits.items():
+            available = min(available, limit - len(self._calls[window]))
+        return max(available, 0)
+    
+    def try_acquire(self, calls: int = 1) -> bool:
+        """Consume budget for upcoming calls, or refuse if any budget would be exceeded."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if self._available() < calls:
+                return False
+            self._used_today += calls
+            for window_calls in self._calls.values():
+                window_calls.extend([now] * calls)
+            return True
+    
+    def available(self) -> int:
+        """Get the number of calls that can be made right now."""
+        with self._lock:
+            self._expire(time.time())
+            return self._available()
+    
+    def usage(self) -> Dict[str, Any]:
+        """Get current consumption against each budget."""
+        with self._lock:
+            self._expire(time.time())
+            return {
+                "day": self._day.isoformat(),
+                "used_today": self._used_today,
+                "daily_limit": self.daily_limit,
+                "windows": {
+                    str(window): {"used": len(self._calls[window]), "limit": limit}
+                    for window, limit in self.window_limits.items()
+                }
+            }
+
+class RefreshScheduler:
+    """Decides which resorts to refresh so popular or stormy ones stay freshest.
+    
+    The sustainable number of refreshes per day (from the daily budget) is
+    shared out in proportion to each resort's weight: one, plus its decayed
+    request popularity, plus its forecast snowfall in storm units. Summed over
+    the catalog the resulting intervals spend exactly the refresh budget.
+    """
+    
+    def __init__(self, quota: QuotaManager, calls_per_refresh: int = len(MODELS),
+                 config: Dict[str, Any] = REFRESH_CONFIG):
+        self.quota = quota
+        self.calls_per_refresh = calls_per_refresh
+        self.budget_share = config["budget_share"]
+        self.min_interval = config["min_interval_minutes"] * 60
+        self.max_interval = config["max_interval_hours"] * 3600
+        self.half_life = config["popularity_half_life_hours"] * 3600
+        self.storm_snowfall = config["storm_snowfall_cm"]
+        self._popularity: Dict[str, Tuple[float, float]] = {}
+        self._refreshed_at: Dict[str, float] = {}
+        self._snowfall: Dict[str, float] = {}
+        self._intervals: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def record_interest(self, resort: str, weight: float = 1.0) -> None:
+        """Count a request for a resort towards its popularity."""
+        now = time.time()
+        with self._lock:
+            self._popularity[resort] = (self._decayed_popularity(resort, now) + weight, now)
+    
+    def _decayed_popularity(self, resort: str, now: float) -> float:
+        """Popularity with exponential decay applied. Caller holds the lock."""
+        score, updated_at = self._popularity.get(resort, (0.0, now))
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+    
+    def note_refreshed(self, resort: str, total_snowfall: float) -> None:
+        """Record a completed refresh and how much snow it forecast."""
+        with self._lock:
+            self._refreshed_at[resort] = time.time()
+            self._snowfall[resort] = total_snowfall
+    
+    def _weight(self, resort: str, now: float) -> float:
+        """Refresh weight of a resort. Caller holds the lock."""
+        return 1.0 + self._decayed_popularity(resort, now) + \
+            self._snowfall.get(resort, 0.0) / self.storm_snowfall
+    
+    def due_resorts(self, resorts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Get the resorts due for refresh, most overdue first, within the remaining budget."""
+        now = time.time()
+        refreshes_per_day = max(self.quota.daily_limit * self.budget_share / self.calls_per_refresh, 1.0)
+        
+        with self._lock:
+            weights = {resort["name"]: self._weight(resort["name"], now) for resort in resorts}
+            total_weight = sum(weights.values())
+            
+            overdue = []
+            for resort in resorts:
+                name = resort["name"]
+                interval = 86400 * total_weight / (weights[name] * refreshes_per_day)
+                interval = min(max(interval, self.min_interval), self.max_interval)
+                self._intervals[name] = interval
+                
+                refreshed_at = self._refreshed_at.get(name)
+                ratio = float("inf") if refreshed_at is None else (now - refreshed_at) / interval
+                if ratio >= 1.0:
+                    overdue.append((ratio, weights[name], resort))
+        
+        overdue.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        capacity = self.quota.available() // self.calls_per_refresh
+        if len(overdue) > capacity:
+            logger.warning(f"Call budget allows {capacity} of {len(overdue)} due refreshes")
+        return [resort for _, _, resort in overdue[:capacity]]
+    
+    def is_due(self, resort: str) -> bool:
+        """Check whether a resort's cached forecast has outlived its refresh interval."""
+        with self._lock:
+            refreshed_at = self._refreshed_at.get(resort)
+            interval = self._intervals.get(resort, self.min_interval)
+            return refreshed_at is None or time.time() - refreshed_at >= interval
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Get the current schedule state per resort."""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "resort": name,
+                    "popularity": round(self._decayed_popularity(name, now), 3),
+                    "snowfall_cm": self._snowfall.get(name, 0.0),
+                    "interval_seconds": round(interval),
+                    "age_seconds": round(now - self._refreshed_at[name]) if name in self._refreshed_at else None
+                }
+                for name, interval in sorted(self._intervals.items())
+            ]
+
 class WeatherService:
     """Service for fetching weather data from various APIs."""
     
-    def __init__(self):
+    def __init__(self, hourly_store: Optional[HourlyStore] = None):
         self.open_meteo_url = API_CONFIG["open_meteo_base_url"]
         self.gfs_url = API_CONFIG["gfs_base_url"]
         self.timeout = API_CONFIG["timeout"]
         self.max_retries = API_CONFIG["max_retries"]
         self.elevation = API_CONFIG["elevation"]
+        self.change_tracker = ChangeTracker()
+        self.quota = QuotaManager(API_CONFIG["daily_call_budget"], API_CONFIG["window_call_budgets"])
+        self.scheduler = RefreshScheduler(self.quota)
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._latest_lock = threading.Lock()
+        self._refresh_locks: Dict[str, threading.Lock] = {}
+        self.hourly_store = hourly_store
     
     def _make_request(self, url: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Make HTTP request with retry logic."""
         for attempt in range(self.max_retries):
+            if not self.quota.try_acquire():
+                logger.warning(f"Upstream call budget exhausted, skipping request to {url}")
+                return None
             try:
                 response = requests.get(url, params=params, timeout=self.timeout)
                 response.raise_for_status()
@@ -46,6 +277,7 @@ class WeatherService:
             "longitude": lon,
             "elevation": self.elevation,
             "daily": "snowfall_sum,temperature_2m_max,temperature_2m_min,precipitation_sum",
+            "hourly": ",".join(HOURLY_CONFIG["variables"]),
             "timezone": "auto",
             "start_date": start_date.isoformat(),
             "end_date": end_date.isoformat()
@@ -67,6 +299,7 @@ class WeatherService:
             "longitude": lon,
             "elevation": self.elevation,
             "daily": "snowfall_sum,temperature_2m_max,temperature_2m_min,precipitation_sum",
+            "hourly": ",".join(HOURLY_CONFIG["variables"]),
             "timezone": "auto",
             "start_date": start_date.isoformat(),
             "end_date": end_date.isoformat()
@@ -95,15 +328,44 @@ class WeatherService:
         
         return snowfall_cm[:WEATHER_CONFIG["forecast_days"]]
     
-    def get_combined_forecast(self, lat: float, lon: float, days: int = 7) -> Dict[str, Any]:
-        """Get combined forecast from both Open-Meteo and GFS."""
+    def store_hourly(self, resort: Optional[str], model: str, data: Optional[Dict[str, Any]]) -> None:
+        """Move a response's hourly block into the hourly store.
+        
+        The block is always removed so snapshots and API payloads stay daily-only.
+        """
+        if not data or "hourly" not in data:
+            return
+        if resort and self.hourly_store is not None:
+            try:
+                self.hourly_store.write_response(resort, model, data)
+            except Exception as e:
+                logger.error(f"Error storing hourly {model} data for {resort}: {e}")
+        data.pop("hourly", None)
+        data.pop("hourly_units", None)
+    
+    def get_combined_forecast(self, lat: float, lon: float, days: int = 7,
+                              resort: Optional[str] = None) -> Dict[str, Any]:
+        """Get combined forecast from both Open-Meteo and GFS.
+        
+        When ``resort`` is given, hourly series from both responses go to the
+        hourly store under that name.
+        """
         open_meteo_data = self.fetch_open_meteo_forecast(lat, lon, days)
         gfs_data = self.fetch_gfs_forecast(lat, lon, days)
+        self.store_hourly(resort, "openMeteo", open_meteo_data)
+        self.store_hourly(resort, "gfs", gfs_data)
+        
+        fingerprints = {
+            "openMeteo": fingerprint_forecast(open_meteo_data),
+            "gfs": fingerprint_forecast(gfs_data)
+        }
         
         result = {
             "openMeteo": open_meteo_data,
             "gfs": gfs_data,
-            "average": []
+            "average": [],
+            "fingerprints": fingerprints,
+            "fingerprint": self.combine_fingerprints(fingerprints)
         }
         
         # Calculate average snowfall
@@ -116,29 +378,103 @@ class WeatherService:
         
         return result
     
-    def fetch_all_resorts_forecast(self, resorts: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Fetch forecast data for all ski resorts."""
-        results = {}
+    @staticmethod
+    def combine_fingerprints(fingerprints: Dict[str, Optional[str]]) -> str:
+        """Combine named fingerprints into one stable fingerprint (usable as an ETag)."""
+        encoded = json.dumps(fingerprints, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+    
+    def _empty_forecast(self) -> Dict[str, Any]:
+        """Placeholder forecast for resorts that have never been fetched."""
+        fingerprints = {model: None for model in MODELS}
+        return {
+            "openMeteo": None,
+            "gfs": None,
+            "average": [0.0] * WEATHER_CONFIG["forecast_days"],
+            "fingerprints": fingerprints,
+            "fingerprint": self.combine_fingerprints(fingerprints)
+        }
+    
+    def _refresh_lock(self, resort_name: str) -> threading.Lock:
+        """Get the lock that serializes upstream fetches for one resort."""
+        with self._latest_lock:
+            return self._refresh_locks.setdefault(resort_name, threading.Lock())
+    
+    def refresh_resort(self, resort: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Refresh one resort if it is still due, storing the snapshot and rescheduling it.
         
-        for resort in resorts:
+        Concurrent callers share one upstream fetch: whoever waits on the
+        resort's lock finds it no longer due and fetches nothing. Returns the new
+        forecast, or None when nothing was fetched or both models failed.
+        """
+        name = resort["name"]
+        with self._refresh_lock(name):
+            if self.get_latest_forecast(name) is not None and not self.scheduler.is_due(name):
+                return None
+            
+            logger.info(f"Fetching forecast for {name}")
+            forecast_data = self.get_combined_forecast(resort["lat"], resort["lon"], resort=name)
+            
+            # Keep the previous snapshot when both models failed; retry next cycle
+            if all(fingerprint is None for fingerprint in forecast_data["fingerprints"].values()):
+                return None
+            
+            with self._latest_lock:
+                self._latest[name] = forecast_data
+            self.scheduler.note_refreshed(name, sum(forecast_data["average"]))
+            return forecast_data
+    
+    def refresh_due_resorts(self, resorts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Refresh the resorts the scheduler says are due and return the new forecasts."""
+        refreshed = {}
+        
+        for resort in self.scheduler.due_resorts(resorts):
             try:
-                name = resort["name"]
-                lat = resort["lat"]
-                lon = resort["lon"]
-                
-                logger.info(f"Fetching forecast for {name}")
-                forecast_data = self.get_combined_forecast(lat, lon)
-                results[name] = forecast_data
+                forecast_data = self.refresh_resort(resort)
+                if forecast_data is None:
+                    continue
+                refreshed[resort["name"]] = forecast_data
                 
                 # Add a small delay to avoid rate limiting
                 time.sleep(0.5)
                 
             except Exception as e:
                 logger.error(f"Error fetching forecast for {resort.get('name', 'Unknown')}: {e}")
-                results[resort.get("name", "Unknown")] = {
-                    "openMeteo": None,
-                    "gfs": None,
-                    "average": [0.0] * WEATHER_CONFIG["forecast_days"]
-                }
+        
+        return refreshed
+    
+    def get_latest_forecast(self, resort_name: str) -> Optional[Dict[str, Any]]:
+        """Get the most recently fetched forecast for a resort, if any."""
+        with self._latest_lock:
+            return self._latest.get(resort_name)
+    
+    def get_resort_forecast(self, resort: Dict[str, Any], days: int = 7) -> Dict[str, Any]:
+        """Get a resort forecast, reusing the scheduled snapshot while it is fresh.
+        
+        A due resort is refreshed through ``refresh_resort``, so reads update the
+        shared snapshot and schedule. Only non-default windows bypass the snapshot.
+        """
+        if days != WEATHER_CONFIG["forecast_days"]:
+            return self.get_combined_forecast(resort["lat"], resort["lon"], days, resort["name"])
+        
+        latest = self.get_latest_forecast(resort["name"])
+        if latest is not None and not self.scheduler.is_due(resort["name"]):
+            return latest
+        
+        self.refresh_resort(resort)
+        return self.get_latest_forecast(resort["name"]) or self._empty_forecast()
+    
+    def fetch_all_resorts_forecast(self, resorts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Fetch forecast data for all ski resorts.
+        
+        Only resorts due under the refresh schedule hit the upstream APIs; the
+        rest are served from their latest snapshot.
+        """
+        self.refresh_due_resorts(resorts)
+        
+        results = {}
+        for resort in resorts:
+            name = resort.get("name", "Unknown")
+            results[name] = self.get_latest_forecast(name) or self._empty_forecast()
         
         return results
@@ -0,0 +1,195 @@
+"""
+Webcam frame proxy with a shared, bounded frame cache.
+
+Each camera is fetched upstream at most once per refresh interval no matter
+how many viewers ask for it. Frames and their downscaled thumbnails are kept
+in an LRU cache bounded by total bytes, and thumbnails are generated once
+per frame rather than once per viewer.
+"""
+import hashlib
+import io
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import requests
+
+try:
+    from PIL import Image
+except ImportError:  # optional dependency
+    Image = None
+
+from config import WEBCAM_CONFIG, WEBCAMS
+
+logger = logging.getLogger(__name__)
+
+class WebcamFrame:
+    """One fetched camera image and the thumbnails derived from it."""
+
+    def __init__(self, content: bytes, content_type: str, upstream_etag: Optional[str] = None,
+                 last_modified: Optional[str] = None):
+        self.content = content
+        self.content_type = content_type
+        self.etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+        self.upstream_etag = upstream_etag
+        self.last_modified = last_modified
+        self.fetched_at = time.monotonic()
+        self.thumbnails: Dict[int, bytes] = {}
+
+    @property
+    def size(self) -> int:
+        """Bytes held by the frame and its thumbnails."""
+        return len(self.content) + sum(len(thumbnail) for thumbnail in self.thumbnails.values())
+
+class FrameCache:
+    """LRU cache of latest frames, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._frames: "OrderedDict[str, WebcamFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, webcam_id: str) -> Optional[WebcamFrame]:
+        with self._lock:
+            frame = self._frames.get(webcam_id)
+            if frame is not None:
+                self._frames.move_to_end(webcam_id)
+            return frame
+
+    def put(self, webcam_id: str, frame: WebcamFrame) -> None:
+        with self._lock:
+            self._frames[webcam_id] = frame
+            self._frames.move_to_end(webcam_id)
+            self._evict()
+
+    def resize(self) -> None:
+        """Re-check the byte bound after a cached frame grew (e.g. a new thumbnail)."""
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used frames until within budget. Caller holds the lock."""
+        total = sum(frame.size for frame in self._frames.values())
+        while total > self.max_bytes and len(self._frames) > 1:
+            _, evicted = self._frames.popitem(last=False)
+            total -= evicted.size
+
+class WebcamService:
+    """Fetches webcam frames upstream on behalf of every viewer."""
+
+    def __init__(self, webcams: Dict[str, Dict[str, Any]] = WEBCAMS,
+                 config: Dict[str, Any] = WEBCAM_CONFIG):
+        self.webcams = webcams
+        self.refresh_interval = config["refresh_interval_seconds"]
+        self.timeout = config["timeout"]
+        self.thumbnail_width = config["thumbnail_width"]
+        self.cache = FrameCache(config["cache_max_bytes"])
+        self.session = requests.Session()
+        self._locks = {webcam_id: threading.Lock() for webcam_id in webcams}
+        # Last upstream attempt per camera, successful or not
+        self._attempted_at: Dict[str, float] = {}
+
+    def get_frame(self, webcam_id: str) -> Optional[WebcamFrame]:
+        """Get the latest frame, fetching upstream only if the cached one has expired.
+
+        Concurrent callers for the same camera wait on one fetch. A failed fetch
+        also counts as the interval's attempt: the previous frame (or nothing)
+        keeps being served until the next interval instead of every viewer
+        retrying upstream during an outage.
+        """
+        if webcam_id not in self.webcams:
+            return None
+
+        frame = self.cache.get(webcam_id)
+        if frame is not None and not self._due(webcam_id, frame):
+            return frame
+
+        with self._locks[webcam_id]:
+            # Another viewer may have refreshed (or tried to) while we waited
+            frame = self.cache.get(webcam_id)
+            if not self._due(webcam_id, frame):
+                return frame
+
+            self._attempted_at[webcam_id] = time.monotonic()
+            fetched = self._fetch(webcam_id, frame)
+            if fetched is not None:
+                self.cache.put(webcam_id, fetched)
+                return fetched
+            return frame
+
+    def _due(self, webcam_id: str, frame: Optional[WebcamFrame]) -> bool:
+        """Check whether a camera is due for an upstream attempt."""
+        last = self._attempted_at.get(webcam_id)
+        if frame is not None:
+            last = frame.fetched_at if last is None else max(last, frame.fetched_at)
+        return last is None or time.monotonic() - last >= self.refresh_interval
+
+    def _fetch(self, webcam_id: str, previous: Optional[WebcamFrame]) -> Optional[WebcamFrame]:
+        """Fetch a frame upstream, revalidating the previous one when possible."""
+        headers = {}
+        if previous is not None:
+            if previous.upstream_etag:
+                headers["If-None-Match"] = previous.upstream_etag
+            if previous.last_modified:
+                headers["If-Modified-Since"] = previous.last_modified
+
+        url = self.webcams[webcam_id]["url"]
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and previous is not None:
+                previous.fetched_at = time.monotonic()
+                return previous
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Failed to fetch webcam {webcam_id}: {e}")
+            return None
+
+        logger.info(f"Fetched webcam frame for {webcam_id} ({len(response.content)} bytes)")
+        if previous is not None and previous.content == response.content:
+            previous.fetched_at = time.monotonic()
+            return previous
+        return WebcamFrame(
+            response.content,
+            response.headers.get("Content-Type", "image/jpeg"),
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+
+    def get_thumbnail(self, webcam_id: str, frame: WebcamFrame) -> Tuple[bytes, str]:
+        """Get the downscaled frame and its content type, generating it once per frame.
+
+        Falls back to the full frame when Pillow is not installed.
+        """
+        width = self.thumbnail_width
+        thumbnail = frame.thumbnails.get(width)
+        if thumbnail is None and Image is None:
+            return frame.content, frame.content_type
+        if thumbnail is not None:
+            return thumbnail, self._thumbnail_type(frame, thumbnail)
+
+        with self._locks[webcam_id]:
+            thumbnail = frame.thumbnails.get(width)
+            if thumbnail is None:
+                try:
+                    image = Image.open(io.BytesIO(frame.content))
+                    image.thumbnail((width, width * 10))
+                    output = io.BytesIO()
+                    image.convert("RGB").save(output, format="JPEG", quality=80)
+                    thumbnail = output.getvalue()
+                except Exception as e:
+                    logger.warning(f"Failed to create thumbnail for webcam {webcam_id}: {e}")
+                    thumbnail = frame.content
+                frame.thumbnails[width] = thumbnail
+        self.cache.resize()
+        return thumbnail, self._thumbnail_type(frame, thumbnail)
+
+    @staticmethod
+    def _thumbnail_type(frame: WebcamFrame, thumbnail: bytes) -> str:
+        """Thumbnails are JPEG unless generation failed and the frame itself was kept."""
+        return frame.content_type if thumbnail is frame.content else "image/jpeg"
+
+    def max_age(self, frame: WebcamFrame) -> int:
+        """Seconds until the frame is due for refresh, for Cache-Control."""
+        return max(int(self.refresh_interval - (time.monotonic() - frame.fetched_at)), 0)
@@ -11,6 +11,37 @@ API_CONFIG = {
     "timeout": 30,
     "max_retries": 3,
     "elevation": 2000,  # Default elevation for ski resorts
+    "daily_call_budget": 10000,  # Open-Meteo free tier
+    "window_call_budgets": {60: 600, 3600: 5000},  # seconds -> max calls
+}
+
+# Refresh Scheduling Configuration
+REFRESH_CONFIG = {
+    "budget_share": 0.8,  # Share of the daily budget spent on scheduled refreshes
+    "min_interval_minutes": 15,
+    "max_interval_hours": 24,
+    "popularity_half_life_hours": 6,
+    "storm_snowfall_cm": 10,  # Each this much forecast snow counts like one extra viewer
+}
+
+# Admission control per route class (see backend/api/admission.py)
+ADMISSION_CONFIG = {
+    # GET /api/forecasts, /api/region/{name}: may call the weather APIs
+    "upstream": {"max_concurrent": 8, "max_queue": 32, "queue_timeout_seconds": 2.0, "retry_after_seconds": 5},
+    # GET /api/webcam/{id}: cached frames, at most one camera fetch per interval
+    "webcam": {"max_concurrent": 32, "max_queue": 128, "queue_timeout_seconds": 3.0, "retry_after_seconds": 2},
+    # POST /api/update-forecasts: one refresh at a time, no queueing
+    "refresh": {"max_concurrent": 1, "max_queue": 0, "queue_timeout_seconds": 0, "retry_after_seconds": 30},
+    # Every other /api route: cheap database and cache reads
+    "read": {"max_concurrent": 64, "max_queue": 256, "queue_timeout_seconds": 5.0, "retry_after_seconds": 1},
+}
+
+# Hourly forecast store (see backend/models/hourly_store.py)
+HOURLY_CONFIG = {
+    "directory": "hourly_store",
+    "axis_start": "2025-01-01T00:00:00+00:00",  # Hour 0 of every column file
+    "variables": ["snowfall", "freezing_level_height", "wind_speed_10m", "wind_gusts_10m", "temperature_2m"],
+    "max_window_hours": 384,
 }
 
 # Database Configuration
@@ -43,6 +74,28 @@ WEATHER_CONFIG = {
     "temperature_units": "celsius",
 }
 
+# Powder Alert Configuration
+ALERT_CONFIG = {
+    "sink": os.getenv("ALERT_SINK", "file"),  # file, queue or webhook
+    "file_path": "alerts.ndjson",
+    "webhook_url": os.getenv("ALERT_WEBHOOK_URL", ""),
+}
+
+# Webcam Proxy Configuration
+WEBCAM_CONFIG = {
+    "refresh_interval_seconds": 30,  # At most one upstream fetch per camera per interval
+    "cache_max_bytes": 32 * 1024 * 1024,
+    "thumbnail_width": 320,
+    "timeout": 10,
+}
+
+WEBCAMS = {
+    "snow-depth": {"name": "Snow Depth Camera", "url": "https://secure.skircr.com/cams2/fecam8/final.jpg"},
+    "copper-mountain": {"name": "Copper Mountain Snow Stake", "url": "https://www.coppercolorado.com/sites/default/files/webcams/snowstake.jpg"},
+    "whistler": {"name": "Whistler Blackcomb", "url": "https://secure.skircr.com/cams2/fecam1/final.jpg"},
+    "aspen": {"name": "Aspen Snowmass", "url": "https://secure.skircr.com/cams2/fecam2/final.jpg"},
+}
+
 # Ski Resort Data
 SKI_RESORTS = [
     {"name": "Whistler", "country": "Canada", "lat": 50.1163, "lon": -122.9574, "elevation": 2000},
@@ -60,9 +113,15 @@ def get_config() -> Dict[str, Any]:
     """Get all configuration settings."""
     return {
         "api": API_CONFIG,
+        "refresh": REFRESH_CONFIG,
+        "admission": ADMISSION_CONFIG,
         "database": DATABASE_CONFIG,
+        "hourly": HOURLY_CONFIG,
         "cors": CORS_CONFIG,
         "app": APP_CONFIG,
         "weather": WEATHER_CONFIG,
+        "alerts": ALERT_CONFIG,
+        "webcam": WEBCAM_CONFIG,
+        "webcams": WEBCAMS,
         "resorts": SKI_RESORTS,
     }
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+SkiStoke bulk export script.
+
+Streams stored forecasts, archived model runs or observations to CSV, NDJSON
+or Parquet. Rows are read from SQLite in fetchmany batches and written out
+batch by batch, so memory use stays flat no matter how much history is
+exported. The database is opened read-only and is never migrated or
+switched to WAL, so exporting is safe next to a running server.
+
+Examples:
+    python export.py forecasts --format csv --output forecasts.csv
+    python export.py runs --format parquet --output runs.parquet --model gfs
+    python export.py forecasts --resort Whistler --start 2026-01-01 --end 2026-03-31
+"""
+import argparse
+import csv
+import json
+import logging
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.models.database import DatabaseManager, to_epoch_day
+from config import DATABASE_CONFIG
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, only needed for Parquet
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson", "parquet")
+DEFAULT_BATCH_SIZE = 10000
+
+# Dataset -> output columns and their Arrow type names
+DATASET_COLUMNS = {
+    "forecasts": [
+        ("region", "string"), ("date", "string"), ("snowfall", "float64"),
+        ("created_at", "string"), ("updated_at", "string"),
+    ],
+    "runs": [
+        ("region", "string"), ("model", "string"), ("run_id", "int64"), ("issued_at", "string"),
+        ("target_date", "string"), ("variable", "string"), ("value", "float64"),
+    ],
+    "observations": [
+        ("region", "string"), ("date", "string"), ("variable", "string"), ("value", "float64"),
+    ],
+}
+
+Query = Tuple[str, List[Any]]
+Batch = List[Tuple[Any, ...]]
+
+def connect_readonly(database: str) -> sqlite3.Connection:
+    """Open an existing database read-only; never creates or alters it."""
+    path = Path(database)
+    if not path.is_file():
+        raise FileNotFoundError(f"Database not found: {database}")
+    conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    conn.execute("PRAGMA busy_timeout = 5000")
+    return conn
+
+def _conditions(region_column: str, date_column: str, resorts: Sequence[str],
+                low: Optional[Any], high: Optional[Any],
+                model_column: Optional[str] = None, models: Sequence[str] = ()) -> Query:
+    """Build a WHERE clause and its parameters from the export filters.
+
+    ``low`` and ``high`` are inclusive bounds on ``date_column``, in whatever
+    form that column stores dates.
+    """
+    clauses = []
+    params: List[Any] = []
+    if resorts:
+        clauses.append(f"{region_column} COLLATE NOCASE IN ({', '.join('?' * len(resorts))})")
+        params.extend(resorts)
+    if low is not None:
+        clauses.append(f"{date_column} >= ?")
+        params.append(low)
+    if high is not None:
+        clauses.append(f"{date_column} <= ?")
+        params.append(high)
+    if model_column and models:
+        clauses.append(f"{model_column} IN ({', '.join('?' * len(models))})")
+        params.extend(models)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def dataset_queries(conn: sqlite3.Connection, dataset: str, resorts: Sequence[str] = (),
+                    start_date: Optional[str] = None, end_date: Optional[str] = None) -> Iterator[Query]:
+    """Get the SELECTs that produce a table-backed dataset, in output order."""
+    if dataset == "forecasts":
+        # One scan per monthly partition, skipping months outside the range.
+        # Partitions key rows by resort id and epoch day; names and ISO dates
+        # are restored on the way out.
+        where, params = _conditions(
+            "r.name", "f.day", resorts,
+            to_epoch_day(start_date) if start_date else None,
+            to_epoch_day(end_date) if end_date else None,
+        )
+        for table in DatabaseManager.list_partitions(conn, start_date, end_date):
+            yield f"""
+                SELECT r.name, date(f.day * 86400, 'unixepoch'), f.snowfall, f.created_at, f.updated_at
+                FROM {table} f
+                JOIN resorts r ON r.id = f.resort_id{where}
+            """, params
+    elif dataset == "observations":
+        where, params = _conditions("region", "date", resorts, start_date, end_date)
+        yield f"SELECT region, date, variable, value FROM forecast_observations{where}", params
+    else:
+        raise ValueError(f"Unknown dataset: {dataset}")
+
+def iter_batches(conn, queries: Iterator[Query], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Batch]:
+    """Step each query's cursor in fetchmany batches instead of materializing results."""
+    for sql, params in queries:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+
+def iter_run_batches(conn: sqlite3.Connection, resorts: Sequence[str] = (),
+                     start_date: Optional[str] = None, end_date: Optional[str] = None,
+                     models: Sequence[str] = (), batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Batch]:
+    """Stream every archived run as its full series, rebuilt from the stored deltas.
+
+    Runs and cells are both read in (region, model, run_id) order and merged:
+    each cell updates the running state of its region and model, and every
+    run emits the latest value of each cell in its date range, as
+    ``ForecastArchive`` reconstructs runs. Only one region and model's state
+    is held at a time.
+    """
+    where, params = _conditions("region", "end_date", resorts, start_date, None, "model", models)
+    if end_date:
+        where += (" AND " if where else " WHERE ") + "start_date <= ?"
+        params.append(end_date)
+    runs = conn.execute(f"""
+        SELECT region, model, run_id, issued_at, start_date, end_date
+        FROM forecast_runs{where}
+        ORDER BY region, model, run_id
+    """, params)
+
+    where, params = _conditions("region", "target_date", resorts, start_date, end_date, "model", models)
+    cells = conn.execute(f"""
+        SELECT region, model, run_id, target_date, variable, value
+        FROM forecast_run_cells{where}
+        ORDER BY region, model, run_id
+    """, params)
+
+    group: Optional[Tuple[str, str]] = None
+    state: Dict[str, Dict[str, Any]] = {}
+    cell = cells.fetchone()
+    batch: Batch = []
+    while True:
+        run_rows = runs.fetchmany(batch_size)
+        if not run_rows:
+            break
+        for region, model, run_id, issued_at, run_start, run_end in run_rows:
+            if (region, model) != group:
+                group, state = (region, model), {}
+            # Apply every delta up to and including this run; cells of
+            # regions or models with no matching runs are skipped
+            while cell is not None and tuple(cell[:3]) <= (region, model, run_id):
+                if tuple(cell[:2]) == group:
+                    state.setdefault(cell[3], {})[cell[4]] = cell[5]
+                cell = cells.fetchone()
+
+            day = date.fromisoformat(max(run_start, start_date) if start_date else run_start)
+            last = date.fromisoformat(min(run_end, end_date) if end_date else run_end)
+            while day <= last:
+                target_date = day.isoformat()
+                for variable, value in sorted(state.get(target_date, {}).items()):
+                    batch.append((region, model, run_id, issued_at, target_date, variable, value))
+                day += timedelta(days=1)
+
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def dataset_batches(conn: sqlite3.Connection, dataset: str, resorts: Sequence[str] = (),
+                    start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    models: Sequence[str] = (), batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Batch]:
+    """Stream a dataset's rows in batches."""
+    if dataset == "runs":
+        return iter_run_batches(conn, resorts, start_date, end_date, models, batch_size)
+    return iter_batches(conn, dataset_queries(conn, dataset, resorts, start_date, end_date), batch_size)
+
+class CsvWriter:
+    """Writes batches as CSV with a header row."""
+
+    def __init__(self, stream, columns: List[Tuple[str, str]]):
+        self.writer = csv.writer(stream)
+        self.writer.writerow([name for name, _ in columns])
+
+    def write(self, rows: Batch) -> None:
+        self.writer.writerows(rows)
+
+    def close(self) -> None:
+        pass
+
+class NdjsonWriter:
+    """Writes batches as one JSON object per line."""
+
+    def __init__(self, stream, columns: List[Tuple[str, str]]):
+        self.stream = stream
+        self.names = [name for name, _ in columns]
+
+    def write(self, rows: Batch) -> None:
+        self.stream.write("".join(
+            json.dumps(dict(zip(self.names, row)), separators=(",", ":")) + "\n" for row in rows
+        ))
+
+    def close(self) -> None:
+        pass
+
+class ParquetWriter:
+    """Writes each batch as one Parquet row group."""
+
+    def __init__(self, path: str, columns: List[Tuple[str, str]]):
+        if pa is None:
+            raise RuntimeError("Parquet output requires the pyarrow package")
+        self.schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows: Batch) -> None:
+        arrays = [
+            pa.array([row[position] for row in rows], field.type)
+            for position, field in enumerate(self.schema)
+        ]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+def export(database: str, dataset: str, fmt: str, output: str = "-",
+           resorts: Sequence[str] = (), start_date: Optional[str] = None,
+           end_date: Optional[str] = None, models: Sequence[str] = (),
+           batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Stream a dataset from a database file to ``output`` ("-" for stdout) and return the row count."""
+    columns = DATASET_COLUMNS[dataset]
+    if fmt == "parquet" and output == "-":
+        raise ValueError("Parquet output needs a file path")
+
+    # Opened first so a missing database fails before any output file is created
+    conn = connect_readonly(database)
+    stream = None
+    writer = None
+    count = 0
+    try:
+        if fmt == "parquet":
+            writer = ParquetWriter(output, columns)
+        else:
+            stream = sys.stdout if output == "-" else open(output, "w", newline="", encoding="utf-8")
+            writer = CsvWriter(stream, columns) if fmt == "csv" else NdjsonWriter(stream, columns)
+
+        for rows in dataset_batches(conn, dataset, resorts, start_date, end_date, models, batch_size):
+            writer.write(rows)
+            count += len(rows)
+    finally:
+        conn.close()
+        if writer is not None:
+            writer.close()
+        if stream is not None and stream is not sys.stdout:
+            stream.close()
+    return count
+
+def _iso_date(value: str) -> str:
+    """argparse type for YYYY-MM-DD dates."""
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError("dates must be YYYY-MM-DD")
+    return value
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Export stored SkiStoke forecasts.")
+    parser.add_argument("dataset", choices=sorted(DATASET_COLUMNS), help="what to export")
+    parser.add_argument("--format", dest="fmt", choices=FORMATS, default="csv", help="output format")
+    parser.add_argument("--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--database", default=DATABASE_CONFIG["database_path"], help="SQLite database path")
+    parser.add_argument("--resort", action="append", default=[], help="only this resort (repeatable)")
+    parser.add_argument("--start", type=_iso_date, help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--end", type=_iso_date, help="last date to include (YYYY-MM-DD)")
+    parser.add_argument("--model", action="append", default=[], help="only this model, runs only (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows fetched per batch")
+    args = parser.parse_args(argv)
+
+    if args.model and args.dataset != "runs":
+        parser.error("--model only applies to the runs dataset")
+    if args.fmt == "parquet" and args.output == "-":
+        parser.error("--format parquet needs --output")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be positive")
+    return args
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Main export function."""
+    # Logs go to stderr so they never mix with data written to stdout
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    args = parse_args(argv)
+
+    try:
+        count = export(
+            args.database, args.dataset, args.fmt, args.output,
+            args.resort, args.start, args.end, args.model, args.batch_size
+        )
+    except Exception as e:
+        logger.error(f"Export failed: {e}")
+        return 1
+
+    print(f"Exported {count} {args.dataset} rows", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
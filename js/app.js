@@ -10,22 +10,48 @@ class SkiStokeApp {
         this.apiBaseUrl = '/api';
         this.cache = new Map();
         this.cacheTimeout = 5 * 60 * 1000; // 5 minutes
+        this.pendingLoad = null;
         
         this.init();
     }
 
     async init() {
         try {
-            await this.loadResorts();
+            // Server-rendered pages embed the resort list and forecast table
+            const bootstrap = this.readBootstrap();
+            if (bootstrap) {
+                this.skiResorts = bootstrap.resorts;
+            } else {
+                await this.loadResorts();
+            }
             this.setupEventListeners();
             this.updateDateHeaders();
-            await this.loadAllForecasts();
+
+            if (bootstrap && bootstrap.forecastsRendered) {
+                // Only hydrate: the table is already in the DOM
+                this.animateSnowCharts();
+                this.animateSummaryCharts();
+            } else {
+                await this.loadAllForecasts();
+            }
         } catch (error) {
             console.error('Failed to initialize app:', error);
             this.showError('Failed to initialize application');
         }
     }
 
+    readBootstrap() {
+        const element = document.getElementById('skistoke-bootstrap');
+        if (!element) return null;
+
+        try {
+            return JSON.parse(element.textContent);
+        } catch (error) {
+            console.error('Invalid bootstrap payload:', error);
+            return null;
+        }
+    }
+
     async loadResorts() {
         try {
             const response = await fetch(`${this.apiBaseUrl}/resorts`);
@@ -93,7 +119,22 @@ class SkiStokeApp {
         }
     }
 
-    async loadAllForecasts() {
+    refreshAllForecasts() {
+        this.cache.delete('forecasts');
+        return this.loadAllForecasts();
+    }
+
+    loadAllForecasts() {
+        // Button click and its inline handler can both fire; share one request
+        if (!this.pendingLoad) {
+            this.pendingLoad = this.fetchAllForecasts().finally(() => {
+                this.pendingLoad = null;
+            });
+        }
+        return this.pendingLoad;
+    }
+
+    async fetchAllForecasts() {
         this.showLoading();
         this.hideError();
 
@@ -86,6 +86,687 @@ def test_database():
         print(f"✗ Database test failed: {e}")
         return False
 
+def test_partitioned_storage():
+    """Test monthly partition routing and retention."""
+    try:
+        import tempfile
+        from datetime import datetime, timedelta
+        from backend.models.database import DatabaseManager
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager(os.path.join(tmp_dir, "test.db"))
+            # A second manager stands in for another worker process on the same file
+            other = DatabaseManager(db_manager.database_path)
+            today = datetime.now().date()
+            old = today - timedelta(days=120)
+            
+            db_manager.insert_forecast("Whistler", today.isoformat(), 12.5)
+            db_manager.insert_forecast("Whistler", old.isoformat(), 3.0)
+            with db_manager.get_connection() as conn:
+                conn.execute("CREATE TABLE snow_forecast_backup (region TEXT, snowfall REAL)")
+                conn.commit()
+            assert len(db_manager.get_partitions()) == 2
+            print("✓ Forecasts written to monthly partitions")
+            
+            results = db_manager.get_top_snow(3, 5)
+            assert results == [{"region": "Whistler", "total_snowfall": 12.5}]
+            print("✓ Queries routed to overlapping partitions")
+            
+            assert other.get_top_snow(3, 5) == results
+            assert len(other.get_region_forecast("Whistler")) == 1
+            print("✓ Partitions created by another process visible to readers")
+            
+            assert other.cleanup_old_data(30)
+            assert db_manager.get_partitions() == [db_manager.get_partitions(today.isoformat())[0]]
+            assert len(db_manager.get_region_forecast("Whistler")) == 1
+            with db_manager.get_connection() as conn:
+                assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'snow_forecast_backup'").fetchone()
+            print("✓ Expired partitions dropped, other tables left alone")
+            
+            # db_manager still has the dropped partition cached for writes
+            assert db_manager.insert_forecast("Whistler", old.isoformat(), 1.0)
+            assert len(other.get_partitions()) == 2
+            print("✓ Writer recovers from a partition dropped elsewhere")
+            other.close()
+            db_manager.close()
+        
+        return True
+    except Exception as e:
+        print(f"✗ Partitioned storage test failed: {e}")
+        return False
+
+def test_schema_migration():
+    """Test online migration of TEXT-keyed partitions to schema v2."""
+    try:
+        import sqlite3
+        import tempfile
+        from datetime import datetime, timedelta
+        from backend.models.database import DatabaseManager, SCHEMA_VERSION
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test.db")
+            today = datetime.now().date()
+            table = "snow_forecast_" + today.strftime("%Y_%m")
+            
+            # A v1 database: TEXT-keyed partition with its redundant index, plus the legacy table
+            conn = sqlite3.connect(path)
+            conn.execute(f"""CREATE TABLE {table} (region TEXT, date TEXT, snowfall REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY(region, date))""")
+            conn.execute(f"CREATE INDEX idx_{table}_region_date ON {table}(region, date)")
+            conn.execute(f"INSERT INTO {table} (region, date, snowfall) VALUES ('Whistler', ?, 12.5)",
+                         (today.isoformat(),))
+            conn.execute("CREATE TABLE snow_forecast (region TEXT, date TEXT, snowfall REAL, created_at TIMESTAMP, updated_at TIMESTAMP)")
+            conn.execute("INSERT INTO snow_forecast (region, date, snowfall) VALUES ('Niseko', ?, 20.0)",
+                         ((today + timedelta(days=1)).isoformat(),))
+            conn.commit()
+            conn.close()
+            
+            db_manager = DatabaseManager(path)
+            with db_manager.get_connection() as conn:
+                assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+                indexes = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+                assert f"idx_{table}_region_date" not in indexes
+                plan = " ".join(row[-1] for row in conn.execute(
+                    f"EXPLAIN QUERY PLAN SELECT resort_id, snowfall FROM {table} WHERE day BETWEEN 1 AND 2"))
+                assert "COVERING INDEX" in plan
+            print("✓ Partitions converted to compact keys with covering index")
+            
+            assert db_manager.get_top_snow(3, 5) == [
+                {"region": "Niseko", "total_snowfall": 20.0},
+                {"region": "Whistler", "total_snowfall": 12.5},
+            ]
+            assert db_manager.get_region_forecast("Whistler") == [{"date": today.isoformat(), "snowfall": 12.5}]
+            db_manager.insert_forecast("Whistler", today.isoformat(), 15.0)
+            assert db_manager.get_region_forecast("Whistler")[0]["snowfall"] == 15.0
+            print("✓ Public API unchanged after migration")
+            
+            assert DatabaseManager(path).get_top_snow(3, 5)[1]["total_snowfall"] == 15.0
+            print("✓ Reopening a migrated database is a no-op")
+            
+            # Several workers starting at once on the same v1 database
+            import threading
+            for attempt in range(5):
+                path = os.path.join(tmp_dir, f"race-{attempt}.db")
+                conn = sqlite3.connect(path)
+                conn.execute(f"""CREATE TABLE {table} (region TEXT, date TEXT, snowfall REAL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY(region, date))""")
+                conn.execute(f"INSERT INTO {table} (region, date, snowfall) VALUES ('Whistler', ?, 12.5)",
+                             (today.isoformat(),))
+                conn.execute("CREATE TABLE snow_forecast (region TEXT, date TEXT, snowfall REAL, created_at TIMESTAMP, updated_at TIMESTAMP)")
+                conn.execute("INSERT INTO snow_forecast (region, date, snowfall) VALUES ('Niseko', ?, 20.0)",
+                             ((today + timedelta(days=1)).isoformat(),))
+                conn.commit()
+                conn.close()
+                
+                managers, errors = [], []
+                def start():
+                    try:
+                        managers.append(DatabaseManager(path))
+                    except Exception as e:
+                        errors.append(e)
+                workers = [threading.Thread(target=start) for _ in range(4)]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                assert not errors, errors
+                assert len(managers[0].get_top_snow(3, 5)) == 2
+            print("✓ Concurrent startups migrate once without failing")
+        
+        return True
+    except Exception as e:
+        print(f"✗ Schema migration test failed: {e}")
+        return False
+
+def test_forecast_archive():
+    """Test delta-compressed model run archive."""
+    try:
+        import tempfile
+        from backend.models.database import DatabaseManager
+        from backend.models.archive import ForecastArchive
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager(os.path.join(tmp_dir, "test.db"))
+            archive = ForecastArchive(db_manager)
+            dates = ["2026-01-01", "2026-01-02", "2026-01-03"]
+            
+            archive.record_run("Niseko", "gfs", {"daily": {"time": dates, "snowfall_sum": [5.0, 10.0, 0.0]}},
+                               issued_at="2025-12-31T00:00:00+00:00")
+            archive.record_run("Niseko", "gfs", {"daily": {"time": dates, "snowfall_sum": [5.0, 20.0, 0.0]}},
+                               issued_at="2026-01-01T00:00:00+00:00")
+            
+            with db_manager.get_connection() as conn:
+                cell_count = conn.execute("SELECT COUNT(*) FROM forecast_run_cells").fetchone()[0]
+            assert cell_count == 4
+            print("✓ Only changed cells stored for later runs")
+            
+            evolution = archive.get_forecast_evolution("Niseko", "2026-01-01")
+            assert [run["value"] for run in evolution] == [5.0, 5.0]
+            assert [run["lead_days"] for run in evolution] == [1, 0]
+            print("✓ Forecast evolution reconstructed from deltas")
+            
+            archive.record_observation("Niseko", "2026-01-02", "snowfall_sum", 18.0)
+            skill = archive.get_model_skill("2026-01-01", "2026-01-03")
+            assert skill[0]["model"] == "gfs" and skill[0]["count"] == 2
+            assert abs(skill[0]["mae"] - 5.0) < 1e-9
+            assert [row["lead_days"] for row in skill[0]["by_lead_days"]] == [1, 2]
+            print("✓ Model skill computed against observations")
+            
+            archive.record_run("Niseko", "gfs", {"daily": {"time": dates, "snowfall_sum": [5.0, 16.0, 0.0]}},
+                               issued_at="2026-01-02T00:00:00+00:00")
+            skill = archive.get_model_skill("2026-01-01", "2026-01-03")
+            assert skill[0]["count"] == 3 and skill[0]["by_lead_days"][0] == {
+                "lead_days": 0, "count": 1, "mae": 2.0, "bias": -2.0
+            }
+            print("✓ Runs after an observation rescored on write")
+            
+            responses = {
+                "gfs": {"daily": {"time": dates[:1], "snowfall_sum": [4.0]}},
+                "openMeteo": {"daily": {"time": dates[:1], "snowfall_sum": [8.0]}},
+            }
+            assert archive.queue_analysis("Niseko", responses).result() == 1
+            assert archive.get_model_skill("2026-01-01", "2026-01-01")[0]["mae"] == 1.0
+            archive.record_observation("Niseko", "2026-01-01", "snowfall_sum", 5.0)
+            assert archive.queue_analysis("Niseko", responses).result() == 0
+            assert archive.get_model_skill("2026-01-01", "2026-01-01")[0]["mae"] == 0.0
+            print("✓ Day-0 analysis used until a reported observation replaces it")
+            db_manager.close()
+        
+        return True
+    except Exception as e:
+        print(f"✗ Forecast archive test failed: {e}")
+        return False
+
+def test_bulk_export():
+    """Test streaming export of partitions and archived runs."""
+    try:
+        import csv
+        import json
+        import tempfile
+        from backend.models.database import DatabaseManager
+        from backend.models.archive import ForecastArchive
+        import export
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = os.path.join(tmp_dir, "test.db")
+            db_manager = DatabaseManager(database)
+            archive = ForecastArchive(db_manager)
+            for day in range(1, 29):
+                db_manager.insert_forecast("Whistler", f"2026-01-{day:02d}", float(day))
+                db_manager.insert_forecast("Hakuba", f"2026-02-{day:02d}", 1.0)
+            archive.record_run("Hakuba", "gfs", {"daily": {"time": ["2026-02-01", "2026-02-02"], "snowfall_sum": [4.0, 5.0]}})
+            archive.record_run("Hakuba", "openMeteo", {"daily": {"time": ["2026-02-01"], "snowfall_sum": [6.0]}})
+            archive.record_run("Hakuba", "gfs", {"daily": {"time": ["2026-02-01", "2026-02-02"], "snowfall_sum": [4.0, 7.0]}})
+            
+            path = os.path.join(tmp_dir, "forecasts.csv")
+            count = export.export(database, "forecasts", "csv", path, resorts=["whistler"],
+                                  start_date="2026-01-10", end_date="2026-02-28", batch_size=7)
+            with open(path, newline="") as handle:
+                rows = list(csv.DictReader(handle))
+            assert count == len(rows) == 19
+            assert {row["region"] for row in rows} == {"Whistler"}
+            print("✓ Filtered forecasts streamed in batches to CSV")
+            
+            path = os.path.join(tmp_dir, "runs.ndjson")
+            assert export.export(database, "runs", "ndjson", path, models=["gfs"], batch_size=1) == 4
+            with open(path) as handle:
+                runs = [json.loads(line) for line in handle]
+            assert [(run["target_date"], run["value"]) for run in runs] == [
+                ("2026-02-01", 4.0), ("2026-02-02", 5.0), ("2026-02-01", 4.0), ("2026-02-02", 7.0)
+            ]
+            assert runs[0]["run_id"] < runs[2]["run_id"]
+            print("✓ Archived runs exported as full series from deltas")
+            
+            if export.pa is not None:
+                path = os.path.join(tmp_dir, "forecasts.parquet")
+                assert export.export(database, "forecasts", "parquet", path, batch_size=10) == 56
+                parquet = export.pq.ParquetFile(path)
+                assert parquet.metadata.num_rows == 56 and parquet.metadata.num_row_groups == 6
+                print("✓ Parquet written one row group per batch")
+            
+            missing = os.path.join(tmp_dir, "missing.db")
+            try:
+                export.export(missing, "forecasts", "csv", os.path.join(tmp_dir, "missing.csv"))
+                assert False, "missing database exported"
+            except FileNotFoundError:
+                pass
+            assert not os.path.exists(missing)
+            print("✓ Missing database rejected without being created")
+        
+        return True
+    except Exception as e:
+        print(f"✗ Bulk export test failed: {e}")
+        return False
+
+def test_response_formats():
+    """Test content negotiation and the binary encodings."""
+    try:
+        from fastapi.testclient import TestClient
+        from backend.api import formats
+        from backend.api.media_types import negotiate, JSON, MSGPACK, ARROW
+        from backend.client import SkiStokeClient
+        from backend.main import app
+        
+        assert negotiate(None) == JSON
+        assert negotiate("application/msgpack") == MSGPACK
+        assert negotiate("text/html, application/vnd.apache.arrow.stream") == ARROW
+        assert negotiate("application/msgpack;q=0.5, application/json") == JSON
+        assert negotiate("application/json;q=0.2, application/vnd.apache.arrow.stream;q=0.8") == ARROW
+        assert negotiate("application/msgpack;q=0") == JSON
+        print("✓ Accept header negotiated by q weight")
+        
+        columns = formats.top_snow_columns([
+            {"region": "Niseko", "total_snowfall": 42.5},
+            {"region": "Whistler", "total_snowfall": 10.0},
+        ])
+        assert SkiStokeClient.read_msgpack(formats.encode(columns, MSGPACK)) == columns
+        table = SkiStokeClient.read_arrow(formats.encode(columns, ARROW))
+        assert table.column("region").to_pylist() == ["Niseko", "Whistler"]
+        assert table.column("total_snowfall").to_pylist() == [42.5, 10.0]
+        print("✓ MessagePack and Arrow round-trip through the client")
+        
+        client = TestClient(app)
+        response = client.get("/api/top-snow")
+        assert response.status_code == 200 and response.headers["vary"] == "Accept"
+        original = formats.msgpack
+        formats.msgpack = None
+        try:
+            response = client.get("/api/top-snow", headers={"Accept": "application/msgpack"})
+        finally:
+            formats.msgpack = original
+        assert response.status_code == 406
+        print("✓ Unavailable encoding answered with 406")
+        
+        return True
+    except Exception as e:
+        print(f"✗ Response formats test failed: {e}")
+        return False
+
+def test_hourly_store():
+    """Test memory-mapped hourly columns on the shared time axis."""
+    try:
+        import math
+        import mmap
+        import tempfile
+        from datetime import datetime, timezone
+        from backend.models.hourly_store import HourlyStore
+        from backend.services.weather_service import WeatherService
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = HourlyStore(tmp_dir, "2026-01-01T00:00:00+00:00")
+            response = {
+                "utc_offset_seconds": 9 * 3600,
+                "hourly": {"time": ["2026-01-02T09:00", "2026-01-02T10:00"], "snowfall": [1.5, None]},
+                "hourly_units": {"snowfall": "cm"}
+            }
+            weather_service = WeatherService(store)
+            weather_service.store_hourly("Niseko", "gfs", response)
+            assert "hourly" not in response and "hourly_units" not in response
+            
+            start = store.hour_index(datetime(2026, 1, 2, tzinfo=timezone.utc))
+            assert start == 24
+            window = store.window("Niseko", "gfs", "snowfall", start, 48)
+            assert len(window) == 2 and window[0] == 1.5 and math.isnan(window[1])
+            assert isinstance(window.obj, mmap.mmap)
+            print("✓ Local hours stored on the UTC axis and read as mmap views")
+            
+            store.write_series("Niseko", "gfs", "snowfall", 30, [4.0])
+            window = store.window("Niseko", "gfs", "snowfall", start, 48)
+            assert len(window) == 7 and math.isnan(window[3]) and window[6] == 4.0
+            assert store.variables("Niseko", "gfs") == ["snowfall"]
+            print("✓ Columns grow with NaN gaps and are remapped")
+            store.close()
+        
+        return True
+    except Exception as e:
+        print(f"✗ Hourly store test failed: {e}")
+        return False
+
+def test_change_detection():
+    """Test forecast fingerprints and change tracking."""
+    try:
+        from backend.services.weather_service import ChangeTracker, fingerprint_forecast
+        
+        run = {"generationtime_ms": 0.4, "daily": {"time": ["2026-01-01"], "snowfall_sum": [5.0]}}
+        rerun = dict(run, generationtime_ms=0.9)
+        assert fingerprint_forecast(run) == fingerprint_forecast(rerun)
+        print("✓ Fingerprints ignore volatile metadata")
+        
+        tracker = ChangeTracker()
+        fingerprints = {"openMeteo": fingerprint_forecast(run), "gfs": None}
+        assert tracker.changed_models("Niseko", fingerprints) == ["openMeteo"]
+        tracker.mark_stored("Niseko", fingerprints)
+        assert tracker.changed_models("Niseko", fingerprints) == []
+        print("✓ Unchanged model output detected")
+        
+        import tempfile
+        from datetime import datetime, timezone
+        from fastapi.testclient import TestClient
+        from backend.api import routes
+        from backend.main import app
+        from backend.models.archive import ForecastArchive
+        from backend.models.database import DatabaseManager
+        from backend.services.weather_service import WeatherService
+        
+        originals = (routes.db_manager, routes.forecast_archive, routes.weather_service)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager(os.path.join(tmp_dir, "test.db"))
+            weather_service = WeatherService()
+            weather_service.refresh_due_resorts = lambda resorts: {}
+            routes.db_manager, routes.weather_service = db_manager, weather_service
+            routes.forecast_archive = ForecastArchive(db_manager)
+            try:
+                client = TestClient(app)
+                today = datetime.now(timezone.utc).date().isoformat()
+                
+                def update(open_meteo, gfs):
+                    responses = {"openMeteo": open_meteo, "gfs": gfs}
+                    for model, snow in responses.items():
+                        data = None if snow is None else {"daily": {"time": [today], "snowfall_sum": [snow]}}
+                        setattr(weather_service, "fetch_open_meteo_forecast" if model == "openMeteo" else "fetch_gfs_forecast",
+                                lambda lat, lon, days=7, data=data: data)
+                    weather_service._latest["Niseko"] = weather_service.get_combined_forecast(0, 0)
+                    assert client.post("/api/update-forecasts").status_code == 200
+                    return db_manager.get_region_forecast("Niseko", 1)[0]["snowfall"]
+                
+                assert update(200.0, 100.0) == 15.0
+                assert update(300.0, None) == 15.0
+                assert update(300.0, 100.0) == 20.0
+                print("✓ Forecast row never stores a partial average and recovers with the model")
+                
+                analysed = routes.forecast_archive.get_model_skill(today, today)
+                assert {row["model"] for row in analysed} == {"openMeteo", "gfs"}
+                response = client.post("/api/observations", json={"region": "niseko", "date": today, "value": 250.0})
+                assert response.status_code == 200
+                skill = {row["model"]: row for row in routes.forecast_archive.get_model_skill(today, today)}
+                assert skill["openMeteo"]["mae"] == 50.0 and skill["gfs"]["bias"] == -150.0
+                assert skill["gfs"]["by_lead_days"][0]["lead_days"] == 0
+                print("✓ Refreshes record an analysis and reported observations replace it")
+            finally:
+                routes.db_manager, routes.forecast_archive, routes.weather_service = originals
+                db_manager.close()
+        
+        return True
+    except Exception as e:
+        print(f"✗ Change detection test failed: {e}")
+        return False
+
+def test_alert_engine():
+    """Test powder alert rule evaluation."""
+    try:
+        import tempfile
+        from backend.models.database import DatabaseManager
+        from backend.services.alert_service import AlertEngine, AlertSink, QueueAlertSink
+        from config import SKI_RESORTS, WEATHER_CONFIG
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sink = QueueAlertSink()
+            engine = AlertEngine(DatabaseManager(os.path.join(tmp_dir, "test.db")), sink)
+            engine.add_rules([
+                {"scope": "resort", "target": "Niseko", "window_days": 2, "threshold_cm": 20},
+                {"scope": "country", "target": "Japan", "window_days": 3, "threshold_cm": 30},
+                {"scope": "any", "window_days": 1, "threshold_cm": 50},
+            ])
+            
+            fired = engine.evaluate({"Niseko": [12.0, 9.0, 10.0, 0.0]}, SKI_RESORTS)
+            assert sorted(alert["rule_id"] for alert in fired) == [1, 2]
+            assert sink.queue.qsize() == 2
+            print("✓ Matching rules fired in one pass")
+            
+            assert engine.evaluate({"Niseko": [12.0, 9.0, 10.0, 0.0]}, SKI_RESORTS) == []
+            print("✓ Active alerts not repeated")
+            
+            reloaded = AlertEngine(engine.db_manager, sink)
+            assert len(reloaded.get_rules()) == 3
+            print("✓ Rules persisted")
+            
+            try:
+                engine.add_rule({"scope": "any", "window_days": WEATHER_CONFIG["forecast_days"] + 1, "threshold_cm": 10})
+                assert False, "window longer than the forecast accepted"
+            except ValueError:
+                pass
+            try:
+                AlertSink()
+                assert False, "abstract sink instantiated"
+            except TypeError:
+                pass
+            print("✓ Windows past the forecast horizon rejected")
+        
+        return True
+    except Exception as e:
+        print(f"✗ Alert engine test failed: {e}")
+        return False
+
+def test_refresh_scheduler():
+    """Test call budgeting and popularity-weighted refresh scheduling."""
+    try:
+        from backend.services.weather_service import QuotaManager, RefreshScheduler
+        from config import SKI_RESORTS
+        
+        quota = QuotaManager(daily_limit=10, window_limits={60: 4})
+        assert quota.try_acquire(4)
+        assert not quota.try_acquire()
+        print("✓ Window budget enforced")
+        
+        quota = QuotaManager(daily_limit=2000, window_limits={})
+        scheduler = RefreshScheduler(quota, calls_per_refresh=2)
+        assert len(scheduler.due_resorts(SKI_RESORTS)) == len(SKI_RESORTS)
+        for resort in SKI_RESORTS:
+            scheduler.note_refreshed(resort["name"], 0.0)
+        scheduler.record_interest("Niseko", 50)
+        scheduler.due_resorts(SKI_RESORTS)
+        intervals = {row["resort"]: row["interval_seconds"] for row in scheduler.snapshot()}
+        assert intervals["Niseko"] < intervals["Whistler"]
+        print("✓ Popular resorts refreshed more often")
+        
+        quota = QuotaManager(daily_limit=5, window_limits={})
+        scheduler = RefreshScheduler(quota, calls_per_refresh=2)
+        assert len(scheduler.due_resorts(SKI_RESORTS)) == 2
+        print("✓ Refreshes capped by remaining budget")
+        
+        import threading
+        import time
+        from backend.services.weather_service import WeatherService
+        weather_service = WeatherService()
+        calls = []
+        def fake_fetch(lat, lon, days=7):
+            calls.append(lat)
+            time.sleep(0.05)
+            return {"daily": {"time": ["2026-01-01"], "snowfall_sum": [10.0]}}
+        weather_service.fetch_open_meteo_forecast = fake_fetch
+        weather_service.fetch_gfs_forecast = fake_fetch
+        resort = SKI_RESORTS[0]
+        readers = [threading.Thread(target=weather_service.get_resort_forecast, args=(resort,)) for _ in range(5)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        assert len(calls) == 2
+        assert weather_service.get_latest_forecast(resort["name"]) is not None
+        assert not weather_service.scheduler.is_due(resort["name"])
+        print("✓ Concurrent reads of a due resort share one refresh")
+        
+        return True
+    except Exception as e:
+        print(f"✗ Refresh scheduler test failed: {e}")
+        return False
+
+def test_write_behind_queue():
+    """Test batched background writes."""
+    try:
+        import tempfile
+        from datetime import date
+        from backend.models.database import DatabaseManager
+        from backend.models.archive import ForecastArchive
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager(os.path.join(tmp_dir, "test.db"))
+            archive = ForecastArchive(db_manager)
+            today = date.today().isoformat()
+            
+            first = db_manager.queue_forecast("Aspen", today, 1.0)
+            second = db_manager.queue_forecast("Aspen", today, 4.0)
+            run = archive.queue_run("Aspen", "gfs", {"daily": {"time": [today], "snowfall_sum": [4.0]}})
+            assert first.result(timeout=5) and second.result(timeout=5)
+            assert run.result(timeout=5) == 1
+            print("✓ Queued writes committed")
+            
+            assert db_manager.get_region_forecast("Aspen", 1) == [{"date": today, "snowfall": 4.0}]
+            print("✓ Coalesced writes keep the latest value")
+            
+            def write_and_list(conn):
+                db_manager._write_forecast(conn, "Aspen", "2030-01-01", 2.0)
+                return db_manager.get_partitions("2030-01-01")
+            assert db_manager.submit_write(write_and_list).result(timeout=5) == []
+            assert db_manager.get_partitions("2030-01-01") == ["snow_forecast_2030_01"]
+            print("✓ New partitions visible to readers only after commit")
+            
+            db_manager.close()
+        
+        return True
+    except Exception as e:
+        print(f"✗ Write-behind queue test failed: {e}")
+        return False
+
+def test_webcam_proxy():
+    """Test that many viewers share one upstream webcam fetch."""
+    try:
+        import threading
+        from http.server import HTTPServer, BaseHTTPRequestHandler
+        from concurrent.futures import ThreadPoolExecutor
+        from backend.services.webcam_service import WebcamService
+        
+        hits = []
+        
+        class ImageHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                hits.append(self.path)
+                if self.path == "/down.jpg":
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.end_headers()
+                self.wfile.write(b"frame-bytes")
+            
+            def log_message(self, *args):
+                pass
+        
+        server = HTTPServer(("127.0.0.1", 0), ImageHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/cam.jpg"
+            service = WebcamService(
+                {"test-cam": {"name": "Test", "url": url}, "down-cam": {"name": "Down", "url": url.replace("cam.jpg", "down.jpg")}},
+                {"refresh_interval_seconds": 60, "cache_max_bytes": 1024, "thumbnail_width": 32, "timeout": 5}
+            )
+            with ThreadPoolExecutor(max_workers=20) as pool:
+                frames = list(pool.map(lambda _: service.get_frame("test-cam"), range(100)))
+            
+            assert len(hits) == 1
+            assert all(frame.content == b"frame-bytes" for frame in frames)
+            print("✓ 100 viewers served by one upstream fetch")
+            
+            with ThreadPoolExecutor(max_workers=20) as pool:
+                frames = list(pool.map(lambda _: service.get_frame("down-cam"), range(50)))
+            assert hits.count("/down.jpg") == 1 and frames == [None] * 50
+            print("✓ Failed fetch not retried by every viewer")
+        finally:
+            server.shutdown()
+        
+        return True
+    except Exception as e:
+        print(f"✗ Webcam proxy test failed: {e}")
+        return False
+
+def test_page_renderer():
+    """Test server-side rendering of the forecast table."""
+    try:
+        from backend.services.weather_service import WeatherService
+        from backend.services.page_renderer import PageRenderer
+        from config import SKI_RESORTS
+        
+        weather_service = WeatherService()
+        renderer = PageRenderer(weather_service, SKI_RESORTS)
+        page, version = renderer.render("forecasts.html")
+        assert '"forecastsRendered":false' in page
+        
+        forecast = {"daily": {"time": ["2026-01-01"], "snowfall_sum": [150.0]}}
+        weather_service._latest["Niseko"] = {
+            "openMeteo": forecast, "gfs": forecast, "fingerprint": "niseko-run"
+        }
+        page, new_version = renderer.render("forecasts.html")
+        assert new_version != version
+        assert '<h4 class="resort-name">Niseko, Japan</h4>' in page
+        assert "15.0 cm" in page
+        print("✓ Forecast table rendered from snapshot")
+        
+        assert renderer.render("forecasts.html")[0] is page
+        print("✓ Render cached per snapshot version")
+        
+        return True
+    except Exception as e:
+        print(f"✗ Page renderer test failed: {e}")
+        return False
+
+def test_admission_control():
+    """Test load shedding for saturated route classes."""
+    try:
+        import asyncio
+        from backend.api.admission import AdmissionController
+        
+        async def run():
+            release = asyncio.Event()
+            
+            async def app(scope, receive, send):
+                if scope["path"] != "/api/health":
+                    await release.wait()
+                await send({"type": "http.response.start", "status": 200, "headers": []})
+                await send({"type": "http.response.body", "body": b"ok"})
+            
+            config = {
+                "upstream": {"max_concurrent": 1, "max_queue": 1, "queue_timeout_seconds": 0.05, "retry_after_seconds": 5},
+                "refresh": {"max_concurrent": 1, "max_queue": 0, "queue_timeout_seconds": 0, "retry_after_seconds": 30},
+                "read": {"max_concurrent": 4, "max_queue": 4, "queue_timeout_seconds": 1, "retry_after_seconds": 1},
+            }
+            controller = AdmissionController(app, config)
+            assert controller.classify("GET", "/api/webcam/whistler") == "webcam"
+            assert controller.classify("GET", "/api/region/Whistler") == "upstream"
+            
+            async def request(path, method="GET"):
+                sent = []
+                async def send(message):
+                    sent.append(message)
+                scope = {"type": "http", "method": method, "path": path, "headers": []}
+                await controller(scope, None, send)
+                return sent[0]["status"], dict(sent[0]["headers"])
+            
+            running = asyncio.ensure_future(request("/api/region/Whistler"))
+            await asyncio.sleep(0)
+            queued = asyncio.ensure_future(request("/api/region/Aspen"))
+            await asyncio.sleep(0)
+            status, headers = await request("/api/region/Niseko")
+            assert status == 503 and headers[b"retry-after"] == b"5"
+            assert (await request("/api/health"))[0] == 200
+            assert (await queued)[0] == 503
+            print("✓ Saturated class shed with 503 while health stays up")
+            
+            release.set()
+            assert (await running)[0] == 200
+            assert (await request("/api/region/Whistler"))[0] == 200
+            stats = controller.stats()["upstream"]
+            assert stats["active"] == 0 and stats["rejected"] == 1 and stats["timed_out"] == 1
+            print("✓ Slots released after completion")
+        
+        asyncio.run(run())
+        return True
+    except Exception as e:
+        print(f"✗ Admission control test failed: {e}")
+        return False
+
 def main():
     """Run all tests."""
     print("Testing SkiStoke Backend...")
@@ -95,6 +776,19 @@ def main():
         ("Import Test", test_imports),
         ("Weather Service Test", test_weather_service),
         ("Database Test", test_database),
+        ("Partitioned Storage Test", test_partitioned_storage),
+        ("Schema Migration Test", test_schema_migration),
+        ("Forecast Archive Test", test_forecast_archive),
+        ("Bulk Export Test", test_bulk_export),
+        ("Response Formats Test", test_response_formats),
+        ("Hourly Store Test", test_hourly_store),
+        ("Change Detection Test", test_change_detection),
+        ("Alert Engine Test", test_alert_engine),
+        ("Refresh Scheduler Test", test_refresh_scheduler),
+        ("Write-Behind Queue Test", test_write_behind_queue),
+        ("Webcam Proxy Test", test_webcam_proxy),
+        ("Page Renderer Test", test_page_renderer),
+        ("Admission Control Test", test_admission_control),
     ]
     
     passed = 0